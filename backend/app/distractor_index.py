@@ -0,0 +1,146 @@
+import re
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from .passage_selector import STOPWORDS
+
+ENTITY = "entity"
+YEAR = "year"
+NUMBER = "number"
+TERM = "term"
+PHRASE = "phrase"
+
+# Buckets to fall back to once a bucket is exhausted
+RELATED_KINDS = {TERM: (PHRASE,), PHRASE: (TERM,)}
+
+# Candidates kept per bucket, most frequent first
+MAX_PER_BUCKET = 100
+
+_YEAR = re.compile(r'\b(1[5-9]\d{2}|20\d{2})\b')
+_NUMBER = re.compile(r'(?<![\w.])\d+(?:[.,]\d+)?%?(?![\w.]\d)')
+_ENTITY = re.compile(r'\b[A-Z][a-zA-Z]+(?:\s+(?:of|the|de|von|van)?\s*[A-Z][a-zA-Z]+)+\b')
+_MID_SENTENCE_CAPITAL = re.compile(r'(?<=[a-z,;:]\s)[A-Z][a-z]{2,}\b')
+_TERM = re.compile(r'\b[a-z][a-z-]{4,}\b')
+# A word right after a determiner is almost always a noun (or an adjective
+# in front of one); verbs and prepositions never are, so only words seen
+# here are kept as single-term candidates
+_DETERMINED = re.compile(r'\b(?i:the|a|an|this|these|those|its|their|each|every|such)\s+([a-z][a-z-]{4,})\b')
+_WORDS = re.compile(r'[a-z0-9]+(?:-[a-z0-9]+)*')
+# Overlapping two-word lowercase phrases ("gradient descent", "neural networks")
+_PHRASE = re.compile(r'\b(?=([a-z][a-z-]{3,} [a-z][a-z-]{3,})\b)')
+_LEADING_WORD = re.compile(r'^(?:The|A|An|In|On|At|By|For|From|During|After|Before|This|These)\s+')
+# Past tenses and adverbs are rarely usable as answer options
+_NON_TERM_SUFFIXES = ("ed", "ly")
+
+_WHO = re.compile(r'^\s*(who|whom|whose)\b|\bwho\b')
+_WHEN = re.compile(r'\b(year|when|date|century)\b')
+_HOW_MANY = re.compile(r'\b(how many|how much|number of|percentage|percent)\b')
+
+
+class DistractorIndex:
+    """Same-type distractor candidates extracted from one document."""
+
+    def __init__(self, buckets: Dict[str, List[str]]):
+        self.buckets = buckets
+
+    def __len__(self):
+        return sum(len(candidates) for candidates in self.buckets.values())
+
+    def pick(
+        self,
+        kind: Optional[str],
+        exclude: Iterable[str],
+        offset: int = 0,
+        context: str = ""
+    ) -> Optional[str]:
+        """Return the first candidate of `kind` not in `exclude` (lowercased), starting at `offset`.
+
+        Candidates whose words all appear in `context` (the question and
+        answer) are skipped, since they would give the answer away or repeat
+        the question. Falls back to related buckets (term <-> phrase) when
+        `kind` is exhausted.
+        """
+        if kind is None:
+            return None
+        excluded = {e.lower() for e in exclude}
+        context_words = set(_WORDS.findall(context.lower()))
+        for bucket in (kind,) + RELATED_KINDS.get(kind, ()):
+            candidates = self.buckets.get(bucket) or []
+            for i in range(len(candidates)):
+                candidate = candidates[(offset + i) % len(candidates)]
+                lowered = candidate.lower()
+                if lowered in excluded or context_words.issuperset(_WORDS.findall(lowered)):
+                    continue
+                return candidate
+        return None
+
+
+def _top(counter: Counter) -> List[str]:
+    return [item for item, _ in counter.most_common(MAX_PER_BUCKET)]
+
+
+def build_distractor_index(text: str) -> DistractorIndex:
+    """
+    Bucket distractor candidates from a document by type.
+
+    Args:
+        text: Cleaned document text
+
+    Returns:
+        DistractorIndex with entity, year, number, term and phrase buckets
+    """
+    start = time.perf_counter()
+
+    years = Counter(_YEAR.findall(text))
+    numbers = Counter(n for n in _NUMBER.findall(text) if n not in years)
+
+    entities = Counter(_LEADING_WORD.sub("", m.strip()) for m in _ENTITY.findall(text))
+    entities.update(w for w in _MID_SENTENCE_CAPITAL.findall(text) if w.lower() not in STOPWORDS)
+    # Single words that are also part of a longer entity are redundant
+    entity_words = {w for e in entities if " " in e for w in e.split()}
+    for word in [e for e in entities if " " not in e and e in entity_words]:
+        del entities[word]
+
+    noun_like = set(_DETERMINED.findall(text))
+    terms = Counter(
+        w for w in _TERM.findall(text)
+        if w in noun_like and w not in STOPWORDS and not w.endswith(_NON_TERM_SUFFIXES)
+    )
+    phrases = Counter(
+        p for p in _PHRASE.findall(text)
+        if not any(w in STOPWORDS or w.endswith(_NON_TERM_SUFFIXES) for w in p.split())
+    )
+
+    index = DistractorIndex({
+        ENTITY: _top(entities),
+        YEAR: _top(years),
+        NUMBER: _top(numbers),
+        TERM: _top(terms),
+        PHRASE: _top(phrases),
+    })
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"🧩 Distractor index: {len(index)} candidates "
+          f"({', '.join(f'{k}={len(v)}' for k, v in index.buckets.items())}) in {elapsed_ms:.1f} ms")
+    return index
+
+
+def infer_kind(question: str, answer: str) -> Optional[str]:
+    """Guess which bucket a missing option should come from (None if no bucket fits)."""
+    question_lower = question.lower()
+    answer = answer.strip()
+
+    if _YEAR.fullmatch(answer) or (_WHEN.search(question_lower) and _YEAR.search(answer)):
+        return YEAR
+    if _NUMBER.fullmatch(answer) or _HOW_MANY.search(question_lower):
+        return NUMBER
+    if _WHO.search(question_lower) or _ENTITY.fullmatch(answer):
+        return ENTITY
+
+    # Sentence-length answers have no same-type candidate in the index
+    words = len(answer.split())
+    if words == 1:
+        return TERM
+    if words <= 4:
+        return PHRASE
+    return None
@@ -0,0 +1,510 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Optional
+
+import google.generativeai as genai
+import requests
+from google.api_core import exceptions as google_exceptions
+
+MODEL_NAME = "gemini-2.5-flash-lite"
+
+# Shared limits for every model call in the process (single and batch requests)
+MODEL_RPM = int(os.getenv("GEMINI_RPM", 0))  # 0 disables rate limiting
+MODEL_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+# Alternative endpoint (REST transport), e.g. a local fake model server
+MODEL_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+# Every request gets a time budget; each model call is capped by what is left
+REQUEST_TIME_BUDGET = float(os.getenv("REQUEST_TIME_BUDGET", 120))
+# Longest a single call may take; a call that times out with less than this
+# (because the request budget was nearly spent) is not the backend's fault
+MODEL_CALL_TIMEOUT = float(os.getenv("MODEL_CALL_TIMEOUT", 60))
+
+# A call still running after the observed p95 gets a duplicate, as long as
+# hedges stay under HEDGE_BUDGET of all calls
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() == "true"
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", 0.1))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# The breaker opens after this many consecutive failed calls and lets a
+# probe through after BREAKER_RESET_TIMEOUT seconds
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 30))
+BREAKER_HALF_OPEN_PROBES = 1
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's time budget runs out before a model call returns."""
+
+
+class ModelUnavailable(Exception):
+    """Raised without calling the model while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker shared by all model calls."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, half_open_probes: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probes = 0
+                print("🔌 Model circuit breaker half-open, probing")
+            if self._probes >= self.half_open_probes:
+                return False
+            self._probes += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                print("🔌 Model circuit breaker closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_neutral(self):
+        """A call that says nothing about backend health; frees its probe slot."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"🔌 Model circuit breaker open after {self._failures} consecutive failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probes = 0
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            retry_in = None
+            if self._state == self.OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "retry_in_seconds": retry_in,
+            }
+
+
+class RateLimiter:
+    """Token bucket that spaces calls to stay under a requests-per-minute quota."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._lock = threading.Lock()
+        self._tokens = float(per_minute)
+        self._updated = time.monotonic()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take one call from the quota, sleeping until it is available.
+
+        Args:
+            timeout: Longest to wait; None waits as long as needed, 0 never waits
+
+        Returns:
+            False (taking nothing) if the call would have to wait past `timeout`
+        """
+        if self.per_minute <= 0:
+            return True
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                refill = (now - self._updated) * self.per_minute / 60.0
+                self._tokens = min(float(self.per_minute), self._tokens + refill)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) * 60.0 / self.per_minute
+            if give_up_at is not None and now + wait > give_up_at:
+                return False
+            time.sleep(wait)
+
+
+def _percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CallMetrics:
+    """Rolling latency windows and hedge counters per call purpose."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._attempt_latencies: Dict[str, Deque[float]] = {}
+        self.reset_calls()
+
+    def reset_calls(self):
+        """Clear call counters and call latencies, keeping the attempt window hedging uses."""
+        with self._lock:
+            self._call_latencies: Dict[str, Deque[float]] = {}
+            self._counts: Dict[str, Dict[str, int]] = {}
+
+    def _counts_for(self, purpose: str) -> Dict[str, int]:
+        return self._counts.setdefault(purpose, {"calls": 0, "hedges": 0, "hedge_wins": 0, "deadline_exceeded": 0})
+
+    def hedge_delay(self, purpose: str) -> Optional[float]:
+        """p95 of single-attempt latency, once enough samples exist."""
+        with self._lock:
+            samples = list(self._attempt_latencies.get(purpose, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return _percentile(samples, 0.95)
+
+    def try_acquire_hedge(self, purpose: str) -> bool:
+        with self._lock:
+            counts = self._counts_for(purpose)
+            if counts["hedges"] + 1 > HEDGE_BUDGET * max(counts["calls"], 1):
+                return False
+            counts["hedges"] += 1
+            return True
+
+    def release_hedge(self, purpose: str):
+        """Return a hedge taken with try_acquire_hedge that was not sent."""
+        with self._lock:
+            self._counts_for(purpose)["hedges"] -= 1
+
+    def record_attempt(self, purpose: str, latency: float):
+        with self._lock:
+            self._attempt_latencies.setdefault(purpose, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    def record_call(self, purpose: str, latency: float, hedge_won: bool = False, deadline_exceeded: bool = False):
+        with self._lock:
+            counts = self._counts_for(purpose)
+            counts["calls"] += 1
+            counts["hedge_wins"] += hedge_won
+            counts["deadline_exceeded"] += deadline_exceeded
+            if not deadline_exceeded:
+                self._call_latencies.setdefault(purpose, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            snapshot = {
+                purpose: (dict(counts), list(self._call_latencies.get(purpose, ())))
+                for purpose, counts in self._counts.items()
+            }
+        summary = {}
+        for purpose, (counts, latencies) in snapshot.items():
+            summary[purpose] = {
+                **counts,
+                "hedge_rate": counts["hedges"] / counts["calls"] if counts["calls"] else 0.0,
+                "p50_ms": _ms(_percentile(latencies, 0.50)),
+                "p95_ms": _ms(_percentile(latencies, 0.95)),
+                "p99_ms": _ms(_percentile(latencies, 0.99)),
+            }
+        return summary
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class UsageTracker:
+    """Aggregates prompt/completion token counts per language."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_language: Dict[str, Dict[str, int]] = {}
+
+    def record(self, language: str, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            totals = self.by_language.setdefault(
+                language, {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0}
+            )
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["calls"] += 1
+
+    def summary(self) -> Dict:
+        with self._lock:
+            by_language = {
+                lang: {**totals, "total_tokens": totals["prompt_tokens"] + totals["completion_tokens"]}
+                for lang, totals in self.by_language.items()
+            }
+        prompt_tokens = sum(t["prompt_tokens"] for t in by_language.values())
+        completion_tokens = sum(t["completion_tokens"] for t in by_language.values())
+        return {
+            "total": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "calls": sum(t["calls"] for t in by_language.values()),
+            },
+            "by_language": by_language,
+        }
+
+
+# Process-wide totals since startup, plus the tracker of the current request
+global_usage = UsageTracker()
+_request_usage: ContextVar[Optional[UsageTracker]] = ContextVar("request_usage", default=None)
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+call_metrics = CallMetrics()
+breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, BREAKER_HALF_OPEN_PROBES)
+rate_limiter = RateLimiter(MODEL_RPM)
+_call_slots = threading.BoundedSemaphore(MODEL_MAX_CONCURRENCY)
+
+# Attempts run here so a slow primary can be raced by a hedge
+_attempt_pool = ThreadPoolExecutor(max_workers=MODEL_MAX_CONCURRENCY * 2, thread_name_prefix="quillium-model")
+
+_models: Dict[Optional[str], genai.GenerativeModel] = {}
+_models_lock = threading.Lock()
+
+
+def start_usage_tracking() -> UsageTracker:
+    """Attach a fresh usage tracker to the current request context."""
+    tracker = UsageTracker()
+    _request_usage.set(tracker)
+    return tracker
+
+
+def start_request_deadline(budget: Optional[float] = None) -> float:
+    """Start the time budget of the current request; returns the monotonic deadline."""
+    deadline = time.monotonic() + (budget if budget is not None else REQUEST_TIME_BUDGET)
+    _request_deadline.set(deadline)
+    return deadline
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left in the current request's budget (None if no budget is set)."""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def _configure(api_key: str):
+    if MODEL_API_ENDPOINT:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": MODEL_API_ENDPOINT})
+    else:
+        genai.configure(api_key=api_key)
+
+
+def _get_model(system_instruction: Optional[str]) -> genai.GenerativeModel:
+    # One model object per static instruction block so it is sent as a
+    # stable prefix instead of being rebuilt into every prompt
+    with _models_lock:
+        model = _models.get(system_instruction)
+        if model is None:
+            model = genai.GenerativeModel(MODEL_NAME, system_instruction=system_instruction)
+            _models[system_instruction] = model
+        return model
+
+
+def _record_usage(response, purpose: str, language: str, tracker: Optional[UsageTracker]):
+    """Add a response's token counts to the process totals and to `tracker` (the request's)."""
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    completion_tokens = getattr(usage, "candidates_token_count", 0) or 0
+
+    global_usage.record(language, prompt_tokens, completion_tokens)
+    if tracker is not None:
+        tracker.record(language, prompt_tokens, completion_tokens)
+
+    print(f"🧮 [{purpose}/{language}] tokens: prompt={prompt_tokens}, completion={completion_tokens}")
+
+
+def generate(
+    prompt: str,
+    api_key: str,
+    system_instruction: Optional[str] = None,
+    generation_config: Optional[Dict] = None,
+    purpose: str = "generate",
+    language: str = "English",
+) -> str:
+    """
+    Run a single Gemini call and record its token usage.
+
+    Args:
+        prompt: Per-call prompt (dynamic content only)
+        api_key: Gemini API key
+        system_instruction: Static instructions shared by all calls of a kind
+        generation_config: Gemini generation config
+        purpose: Label used in usage accounting (e.g. "generate", "translate")
+        language: Language the call produces output in
+
+    Returns:
+        Stripped response text
+
+    Raises:
+        ModelUnavailable: the circuit breaker is open (no call is made)
+        DeadlineExceeded: the request's time budget ran out
+    """
+    _configure(api_key)
+    model = _get_model(system_instruction)
+
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        call_metrics.record_call(purpose, 0.0, deadline_exceeded=True)
+        raise DeadlineExceeded(f"No time left in the request budget for {purpose} call")
+
+    if not breaker.allow_request():
+        raise ModelUnavailable(f"Model circuit breaker is {breaker.state}; skipping {purpose} call")
+
+    # Waiting for quota comes out of the request budget, so the call timeout
+    # is whatever is left afterwards
+    acquired = rate_limiter.acquire(remaining_time())
+    remaining = remaining_time()
+    timeout = MODEL_CALL_TIMEOUT if remaining is None else min(MODEL_CALL_TIMEOUT, remaining)
+    if not acquired or timeout <= 0:
+        breaker.record_neutral()
+        call_metrics.record_call(purpose, 0.0, deadline_exceeded=True)
+        raise DeadlineExceeded(f"Request budget ran out waiting for quota for {purpose} call")
+
+    # Captured here: a losing hedge attempt lands on a pool thread, outside
+    # the request context, and its tokens still belong to this request
+    tracker = _request_usage.get()
+    try:
+        response = _hedged_call(model, prompt, generation_config, purpose, language, timeout, tracker)
+    except Exception as e:
+        if _is_backend_fault(e, budget_clipped=timeout < MODEL_CALL_TIMEOUT):
+            breaker.record_failure()
+        else:
+            breaker.record_neutral()
+        raise
+    breaker.record_success()
+    _record_usage(response, purpose, language, tracker)
+    return response.text.strip()
+
+
+def _is_backend_fault(error: Exception, budget_clipped: bool) -> bool:
+    """Whether a failed call should count against the circuit breaker.
+
+    5xx, 429, connection errors and full-length timeouts count; 4xx and
+    timeouts cut short by the caller's request budget do not.
+    """
+    if isinstance(error, (DeadlineExceeded, google_exceptions.DeadlineExceeded,
+                          requests.exceptions.Timeout, TimeoutError)):
+        return not budget_clipped
+    if isinstance(error, (google_exceptions.ServerError, google_exceptions.TooManyRequests)):
+        return True
+    if isinstance(error, google_exceptions.ClientError):
+        return False
+    return isinstance(error, (ConnectionError, requests.exceptions.ConnectionError))
+
+
+def _attempt(model, prompt: str, generation_config: Optional[Dict], purpose: str, deadline: float):
+    with _call_slots:
+        start = time.monotonic()
+        # The caller may have given up while this attempt waited for a slot
+        timeout = deadline - start
+        if timeout <= 0:
+            raise DeadlineExceeded(f"{purpose} attempt got a call slot after its deadline")
+        # The client's default retry re-sends 503s for up to 10 minutes, past
+        # the request deadline and hidden from the breaker; hedging replaces it
+        response = model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={"timeout": timeout, "retry": None},
+        )
+        call_metrics.record_attempt(purpose, time.monotonic() - start)
+        return response
+
+
+def _hedged_call(
+    model,
+    prompt: str,
+    generation_config: Optional[Dict],
+    purpose: str,
+    language: str,
+    timeout: float,
+    tracker: Optional[UsageTracker]
+):
+    """Run one call, duplicating it once if it outlives the observed p95.
+
+    Whichever attempt succeeds first wins; a losing attempt can't be
+    cancelled mid-request, so its tokens are still recorded when it lands.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    attempts = [_attempt_pool.submit(_attempt, model, prompt, generation_config, purpose, deadline)]
+
+    delay = call_metrics.hedge_delay(purpose) if HEDGE_ENABLED else None
+    if delay is not None and delay < timeout:
+        done, _ = wait(attempts, timeout=delay)
+        if not done and call_metrics.try_acquire_hedge(purpose):
+            # A hedge is a real call against the quota; without spare quota
+            # right now it is skipped rather than waited for
+            if rate_limiter.acquire(timeout=0):
+                print(f"🪝 [{purpose}/{language}] call exceeded p95 ({delay * 1000:.0f} ms), hedging")
+                attempts.append(_attempt_pool.submit(
+                    _attempt, model, prompt, generation_config, purpose, deadline
+                ))
+            else:
+                call_metrics.release_hedge(purpose)
+
+    pending = set(attempts)
+    error = None
+    winner = None
+    while pending and winner is None:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                winner = future
+                break
+            error = future.exception()
+
+    if winner is None:
+        if error is not None and not pending:
+            call_metrics.record_call(purpose, time.monotonic() - start)
+            raise error
+        call_metrics.record_call(purpose, time.monotonic() - start, deadline_exceeded=True)
+        raise DeadlineExceeded(f"{purpose} call did not finish within {timeout:.1f}s")
+
+    call_metrics.record_call(purpose, time.monotonic() - start, hedge_won=winner is not attempts[0])
+    for future in attempts:
+        if future is not winner:
+            future.add_done_callback(
+                lambda f: f.exception() is None and _record_usage(f.result(), purpose, language, tracker)
+            )
+    return winner.result()
+
+
+def count_tokens(contents: str, api_key: str, system_instruction: Optional[str] = None) -> int:
+    """Count prompt tokens for contents (plus system instruction) without generating."""
+    _configure(api_key)
+    model = _get_model(system_instruction)
+    return model.count_tokens(contents).total_tokens
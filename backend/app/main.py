@@ -1,19 +1,91 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+import asyncio
+import contextvars
+import functools
+import io
 import os
+import zipfile
 from dotenv import load_dotenv
 
-from .models import ProcessRequest, ProcessResponse, HealthResponse
-from .pdf_processor import extract_text_from_pdf
-from .mcq_generator import make_mcqs, make_flashcards, init_translator
+from .models import (
+    ProcessRequest, ProcessResponse, MultiLanguageProcessResponse, MoreQuestionsResponse,
+    HealthResponse, UsageReport, ProgressData, ProgressEventBatch, ProgressEventKind,
+    ProgressIngestResponse, FlashcardDeck, ReviewBatch, ReviewResponse, DueCardsResponse
+)
+from .pdf_processor import extract_text_sample
+from .distractor_index import build_distractor_index
+from .responses import dumps, json_response
+from .mcq_generator import (
+    PROMPT_TOKEN_BUDGET, make_mcqs, make_mcqs_multi, make_english_mcqs, translate_mcqs,
+    make_flashcards, init_translator
+)
+from .passage_selector import CHARS_PER_TOKEN, join_spans, select_salient_spans
+from .session_store import (
+    append_text, chunks_for_spans, create_session, delete_document, document_id, extracted_pages,
+    is_document_id, prune_sessions,
+    load_document, load_session, record_issued, release_chunks, reserve_chunks, save_document,
+    save_session, select_regions, session_lock, uncovered_chars, uncovered_chunks, unextracted_pages
+)
+from .progress_store import IngestionOverloaded, get_progress, progress_writer
+from .srs import add_cards, card_id, due_cards, record_reviews
+from .llm_client import (
+    breaker, call_metrics, global_usage, start_request_deadline, start_usage_tracking
+)
 
 load_dotenv()
 
 # Global state
 translator_loaded = False
 
+MAX_FILE_SIZE = 10 * 1024 * 1024
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", 50))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+# Cap on the raw batch upload, and on the PDFs it expands to once unzipped
+BATCH_MAX_TOTAL_SIZE = int(os.getenv("BATCH_MAX_TOTAL_SIZE", 200 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_LANGUAGES_PER_REQUEST = 10
+
+# Follow-up prompts: minimum size in tokens (also the floor of their budget),
+# and how many earlier questions are listed so the model avoids them
+MIN_FOLLOW_UP_TOKENS = 300
+MAX_AVOID_QUESTIONS = 30
+# Seconds between sweeps for expired sessions
+SESSION_PRUNE_INTERVAL = 60 * 60
+
+# Characters of page text extracted up front. Larger documents are sampled
+# (pages evenly spread over the document) and the remaining pages are read
+# when follow-up questions need them
+EXTRACTION_CHAR_BUDGET = int(os.getenv("EXTRACTION_CHAR_BUDGET", 60000))
+FOLLOW_UP_EXTRACTION_CHARS = EXTRACTION_CHAR_BUDGET // 3
+
+MAX_PROGRESS_EVENTS_PER_REQUEST = 1000
+MAX_USER_ID_LENGTH = 128
+MAX_DUE_CARDS = 100
+MAX_REVIEWS_PER_REQUEST = 1000
+MAX_CARDS_PER_REQUEST = 1000
+
+# Extraction and generation run here for both single and batch requests, so
+# the event loop stays free and bulk uploads can't oversubscribe the host
+worker_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("WORKER_THREADS", 8)),
+    thread_name_prefix="quillium-worker"
+)
+
+async def prune_sessions_periodically():
+    """Delete expired sessions and kept PDFs, at startup and then hourly."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, prune_sessions)
+        except Exception as e:
+            print(f"⚠️ Session pruning failed: {e}")
+        await asyncio.sleep(SESSION_PRUNE_INTERVAL)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -26,8 +98,13 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️ Translator initialization note: {e}")
         translator_loaded = False
+    progress_writer.start()
+    prune_task = asyncio.create_task(prune_sessions_periodically())
     yield
     # Shutdown
+    prune_task.cancel()
+    progress_writer.stop()
+    worker_pool.shutdown(wait=False, cancel_futures=True)
     print("👋 Shutting down Quillium backend")
 
 app = FastAPI(
@@ -56,19 +133,41 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /process-pdf": "Process PDF and generate questions",
+            "POST /process-pdf/batch": "Process many PDFs (or zips) and stream results",
+            "POST /documents/{document_id}/more-questions": "Generate more questions for a processed PDF",
+            "POST /progress/events": "Record a batch of answer/quiz/flashcard events",
+            "GET /progress/{user_id}": "Get a user's aggregated progress",
+            "POST /srs/{user_id}/cards": "Add flashcards to a user's review deck",
+            "GET /srs/{user_id}/due": "Get the next flashcards due for review",
+            "POST /srs/{user_id}/reviews": "Record a batch of flashcard reviews",
             "GET /health": "Check API health",
-            "GET /languages": "Get supported languages"
+            "GET /languages": "Get supported languages",
+            "GET /usage": "Get token usage since startup",
+            "GET /metrics": "Get model call latency and hedging metrics"
         }
     }
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
+    model_breaker = breaker.snapshot()
     return HealthResponse(
-        status="healthy",
+        # Still serving (with fallbacks) while the model backend is failing
+        status="healthy" if model_breaker["state"] == "closed" else "degraded",
         translator_loaded=translator_loaded,
-        model_cache_exists=False  # No longer using local model cache
+        model_cache_exists=False,  # No longer using local model cache
+        model_breaker=model_breaker
     )
 
+@app.get("/usage", response_model=UsageReport)
+async def get_usage():
+    """Token usage aggregated per language since startup."""
+    return global_usage.summary()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Model call latency percentiles, hedge rate and deadline misses per call purpose."""
+    return {"model_calls": call_metrics.summary()}
+
 @app.get("/languages")
 async def get_languages():
     languages = {
@@ -94,11 +193,345 @@ async def get_languages():
     }
     return languages
 
-@app.post("/process-pdf", response_model=ProcessResponse)
+def validate_pdf_upload(filename: str, contents: bytes):
+    """Reject uploads that are not non-empty PDFs under the size limit."""
+    if not filename or not filename.lower().endswith('.pdf'):
+        raise HTTPException(
+            status_code=400,
+            detail="File must be a PDF (.pdf)"
+        )
+    
+    if len(contents) == 0:
+        raise HTTPException(
+            status_code=400,
+            detail="Uploaded file is empty"
+        )
+    
+    if len(contents) > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail="File size must be less than 10MB"
+        )
+
+def build_flashcards(mcqs: List[dict], language: str) -> List[dict]:
+    """Build flashcards from the generated MCQs so they match exactly."""
+    print(f"📚 Building {len(mcqs)} flashcards from generated MCQs in {language}...")
+    flashcards = []
+    for idx, m in enumerate(mcqs):
+        try:
+            flashcards.append({
+                "id": card_id(m.get("question", ""), m.get("answer", "")),
+                "question": m.get("question", ""),
+                "answer": m.get("answer", "")
+            })
+        except Exception as e:
+            print(f"⚠️ Error creating flashcard for MCQ {idx}: {e}")
+            # Fallback to a simple flashcard
+            flashcards.append({
+                "question": m.get("question", ""),
+                "answer": m.get("answer", "")
+            })
+    return flashcards
+
+def process_document(
+    contents: bytes,
+    language: str,
+    question_count: int,
+    languages: Optional[List[str]] = None
+) -> dict:
+    """
+    Extract text from a validated PDF and generate MCQs and flashcards.
+    
+    When `languages` is given, English questions are generated once and
+    translated into every language, and the result is keyed by language.
+    Runs on a worker thread; raises HTTPException for user-facing failures.
+    """
+    usage = start_usage_tracking()
+    start_request_deadline()
+    
+    # Process PDF, reading only as many pages as generation can use
+    text, page_count, page_offsets, repeated_lines = extract_text_sample(contents, EXTRACTION_CHAR_BUDGET)
+    
+    # Check if we got meaningful text
+    if len(text) < 100:
+        raise HTTPException(
+            status_code=400,
+            detail=f"PDF doesn't contain enough text. Only found {len(text)} characters."
+        )
+    
+    # Built once per document and shared by every language's validation
+    distractors = build_distractor_index(text)
+    
+    targets = languages or [language]
+    print(f"📄 Generating {question_count} MCQs from {page_count} pages ({len(text)} chars)...")
+    print(f"🌐 Processing in languages: {', '.join(targets)}")
+    
+    # The English set is needed for the session even when not requested;
+    # it is generated anyway, so asking for it costs nothing extra
+    english_key = next((lang for lang in targets if lang.lower() == "english"), "English")
+    generation_languages = targets if english_key in targets else targets + [english_key]
+    
+    # Generate MCQs in English once, then in every target language
+    spans = select_salient_spans(text, token_budget=PROMPT_TOKEN_BUDGET)
+    mcqs_by_language = make_mcqs_multi(
+        text,
+        generation_languages,
+        max_questions=question_count,
+        distractors=distractors,
+        prompt_text=join_spans(text, spans)
+    )
+    
+    # Remember what was asked from which regions for /more-questions
+    doc_id = document_id(contents)
+    with session_lock(doc_id):
+        session = load_session(doc_id) or create_session(doc_id, text, page_count, page_offsets, repeated_lines)
+        record_issued(session, chunks_for_spans(session, spans), mcqs_by_language[english_key])
+        save_session(session)
+        if unextracted_pages(session):
+            save_document(doc_id, contents)
+    
+    results = {}
+    for lang in targets:
+        mcqs = mcqs_by_language[lang]
+        print(f"📝 Generated {len(mcqs)} MCQs in {lang}")
+        if mcqs:
+            print(f"   First question (preview): {mcqs[0]['question'][:80]}...")
+        
+        # Validate we got some results
+        if not mcqs:
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to generate questions from the document. Please check if GEMINI_API_KEY is set."
+            )
+        
+        results[lang] = {"mcqs": mcqs, "flashcards": build_flashcards(mcqs, lang)}
+    
+    usage_summary = usage.summary()
+    print(f"🧮 Request used {usage_summary['total']['total_tokens']} tokens "
+          f"in {usage_summary['total']['calls']} calls")
+    
+    preview = text[:500] + "..." if len(text) > 500 else text
+    
+    # Everything here was validated when it was generated, so the payload is
+    # returned as plain data in the ProcessResponse /
+    # MultiLanguageProcessResponse shape instead of being re-validated
+    if languages is None:
+        return {
+            "document_id": doc_id,
+            "text": preview,
+            "page_count": page_count,
+            "mcqs": results[language]["mcqs"],
+            "flashcards": results[language]["flashcards"],
+            "usage": usage_summary
+        }
+    
+    return {
+        "document_id": doc_id,
+        "text": preview,
+        "page_count": page_count,
+        "results": results,
+        "usage": usage_summary
+    }
+
+def generate_more_questions(doc_id: str, language: str, question_count: int) -> dict:
+    """
+    Generate `question_count` new questions for a processed document.
+    
+    Questions come from the most central regions not used yet (or from the
+    whole document once everything is covered) and are de-duplicated
+    against every question issued for the document so far.
+    """
+    usage = start_usage_tracking()
+    start_request_deadline()
+    
+    # The lock is held only while the session is read and written, not
+    # during generation, so follow-ups for one document don't park worker
+    # threads behind each other's model calls
+    with session_lock(doc_id):
+        session = load_session(doc_id)
+        if session is None:
+            raise HTTPException(
+                status_code=404,
+                detail="Unknown document. Upload it to /process-pdf first."
+            )
+        
+        # A prompt sized for this increment, filled with the best regions left
+        token_budget = max(MIN_FOLLOW_UP_TOKENS, PROMPT_TOKEN_BUDGET * question_count // 20)
+        
+        # Read more pages of a sampled document once the extracted text is used up
+        if uncovered_chars(session) < token_budget * CHARS_PER_TOKEN and unextracted_pages(session):
+            contents = load_document(doc_id)
+            if contents is not None:
+                # Headers and footers learned from earlier pages are removed
+                # even when too few new pages are read to recognise them
+                more_text, page_count, page_offsets, repeated_lines = extract_text_sample(
+                    contents,
+                    FOLLOW_UP_EXTRACTION_CHARS,
+                    skip_pages=extracted_pages(session),
+                    known_repeated=session.get("repeated_lines", [])
+                )
+                # A failed extraction returns an error message, not page text
+                if page_count and page_offsets:
+                    append_text(session, more_text, page_offsets)
+                    session["repeated_lines"] = repeated_lines
+                    save_session(session)
+                    if not unextracted_pages(session):
+                        delete_document(doc_id)
+        
+        chosen = select_regions(session, token_budget, MIN_FOLLOW_UP_TOKENS)
+        reserve_chunks(doc_id, chosen)
+        text = session["text"]
+        avoid_questions = [q["question"] for q in session["questions"][-MAX_AVOID_QUESTIONS:]]
+    
+    try:
+        prompt_text = " ".join(text[start:end] for start, end in (session["chunks"][i] for i in chosen))
+        print(f"➕ Generating {question_count} more MCQs for {doc_id[:12]} "
+              f"from {len(chosen)} regions ({len(prompt_text)} chars)")
+        
+        # Ask for a couple extra to survive de-duplication
+        english_mcqs = make_english_mcqs(
+            prompt_text,
+            question_count + 2,
+            distractors=build_distractor_index(text),
+            avoid_questions=avoid_questions
+        )
+    except BaseException:
+        with session_lock(doc_id):
+            release_chunks(doc_id, chosen)
+        raise
+    
+    with session_lock(doc_id):
+        release_chunks(doc_id, chosen)
+        # Re-read: other follow-ups may have issued questions meanwhile
+        session = load_session(doc_id) or session
+        fresh = record_issued(session, chosen, english_mcqs, limit=question_count)
+        save_session(session)
+        remaining = len(uncovered_chunks(session))
+        remaining_pages = unextracted_pages(session)
+    
+    if not fresh:
+        raise HTTPException(
+            status_code=409,
+            detail="No new questions could be generated for this document."
+        )
+    
+    mcqs = translate_mcqs(fresh, language)
+    return {
+        "document_id": doc_id,
+        "mcqs": mcqs,
+        "flashcards": build_flashcards(mcqs, language),
+        "remaining_regions": remaining,
+        "remaining_pages": remaining_pages,
+        "usage": usage.summary()
+    }
+
+async def run_in_worker(func, *args):
+    """Run a blocking function on the shared worker pool, keeping request context."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(worker_pool, functools.partial(context.run, func, *args))
+
+def parse_languages(languages: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma separated language list, dropping blanks and duplicates."""
+    if not languages:
+        return None
+    
+    parsed = []
+    for lang in languages.split(","):
+        lang = lang.strip()
+        if lang and lang not in parsed:
+            parsed.append(lang)
+    
+    if not parsed:
+        return None
+    if len(parsed) > MAX_LANGUAGES_PER_REQUEST:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_LANGUAGES_PER_REQUEST} languages can be requested at once"
+        )
+    return parsed
+
+def validate_question_count(question_count: int):
+    if question_count < 5 or question_count > 20:
+        raise HTTPException(
+            status_code=400,
+            detail="Question count must be between 5 and 20"
+        )
+
+def extract_pdfs_from_zip(
+    contents: bytes,
+    max_documents: int,
+    max_total_size: int
+) -> List[Tuple[str, Optional[bytes], Optional[str]]]:
+    """Return (filename, bytes, error) for every PDF inside a zip archive.
+    
+    Entries over the size limit or that can't be read (bad CRC, encrypted,
+    unsupported compression) come back with None and an error message, so
+    they fail alone. macOS metadata (__MACOSX/, dot-files) is skipped.
+    The archive is rejected before anything is inflated if it holds more
+    than `max_documents` PDFs or more than `max_total_size` bytes of them
+    (uncompressed sizes from the zip directory; reads never go past them).
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(contents))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Uploaded zip archive is corrupt")
+    
+    documents = []
+    with archive:
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.pdf')
+            and not info.filename.startswith('__MACOSX/')
+            and not os.path.basename(info.filename).startswith('.')
+        ]
+        if len(entries) > max_documents:
+            raise HTTPException(
+                status_code=400,
+                detail=f"A batch may contain at most {BATCH_MAX_DOCUMENTS} documents"
+            )
+        if sum(info.file_size for info in entries if info.file_size <= MAX_FILE_SIZE) > max_total_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch documents may total at most {BATCH_MAX_TOTAL_SIZE // (1024 * 1024)}MB"
+            )
+        
+        for info in entries:
+            # Oversized entries are reported, never inflated
+            if info.file_size > MAX_FILE_SIZE:
+                documents.append((info.filename, None, "File size must be less than 10MB"))
+                continue
+            try:
+                documents.append((info.filename, archive.read(info), None))
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                print(f"⚠️ [BATCH] Could not read {info.filename} from zip: {e}")
+                documents.append((info.filename, None, f"Could not read file from zip archive: {e}"))
+    return documents
+
+async def read_upload(upload: UploadFile, limit: int) -> bytes:
+    """Read an upload in chunks, rejecting it as soon as it passes `limit` bytes."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch uploads may total at most {BATCH_MAX_TOTAL_SIZE // (1024 * 1024)}MB"
+            )
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+@app.post("/process-pdf", response_model=Union[ProcessResponse, MultiLanguageProcessResponse])
 async def process_pdf(
+    request: Request,
     file: UploadFile = File(...),
     language: str = Form("English"),
-    question_count: int = Form(20)
+    question_count: int = Form(20),
+    languages: Optional[str] = Form(None)
 ):
     """
     Process a PDF file and generate MCQs and flashcards.
@@ -107,105 +540,259 @@ async def process_pdf(
         file: PDF file to process
         language: Target language for questions
         question_count: Number of questions to generate (5-20)
+        languages: Optional comma separated list of target languages; overrides
+            `language` and returns results keyed by language
     
     Returns:
-        ProcessResponse with extracted text, page count, MCQs and flashcards
+        ProcessResponse with extracted text, page count, MCQs and flashcards,
+        or MultiLanguageProcessResponse when `languages` is given
     """
     try:
         print(f"📥 [ENDPOINT] Received request:")
         print(f"   File: {file.filename}")
         print(f"   Language: {language}")
+        print(f"   Languages: {languages}")
         print(f"   Question count: {question_count}")
         
         # Validate inputs
-        if question_count < 5 or question_count > 20:
-            raise HTTPException(
-                status_code=400,
-                detail="Question count must be between 5 and 20"
-            )
-        
-        # Validate file type
-        if not file.filename.endswith('.pdf'):
-            raise HTTPException(
-                status_code=400,
-                detail="File must be a PDF (.pdf)"
-            )
+        validate_question_count(question_count)
+        target_languages = parse_languages(languages)
         
-        # Read file content
+        # Read and validate file content
         contents = await file.read()
-        if len(contents) == 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Uploaded file is empty"
-            )
-        
-        # Limit file size (10MB)
-        if len(contents) > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=400,
-                detail="File size must be less than 10MB"
-            )
+        validate_pdf_upload(file.filename, contents)
         
-        # Process PDF
-        text, page_count = extract_text_from_pdf(contents)
+        result = await run_in_worker(process_document, contents, language, question_count, target_languages)
+        return json_response(request, result)
         
-        # Check if we got meaningful text
-        if len(text) < 100:
-            raise HTTPException(
-                status_code=400,
-                detail=f"PDF doesn't contain enough text. Only found {len(text)} characters."
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error processing PDF: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+@app.post("/process-pdf/batch")
+async def process_pdf_batch(
+    files: List[UploadFile] = File(...),
+    language: str = Form("English"),
+    question_count: int = Form(20),
+    languages: Optional[str] = Form(None)
+):
+    """
+    Process many PDFs (or zip archives of PDFs) concurrently.
+    
+    Documents share the worker pool and model rate limits with single
+    requests. Results are streamed as newline-delimited JSON, one line per
+    document in completion order, followed by a summary line.
+    """
+    validate_question_count(question_count)
+    target_languages = parse_languages(languages)
+    
+    if len(files) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {BATCH_MAX_DOCUMENTS} documents"
+        )
+    
+    # Both the raw upload and the documents it expands to are capped, and
+    # zip limits are checked before any entry is inflated
+    documents = []
+    uploaded = 0
+    total_size = 0
+    for upload in files:
+        contents = await read_upload(upload, BATCH_MAX_TOTAL_SIZE - uploaded)
+        uploaded += len(contents)
+        if upload.filename and upload.filename.lower().endswith('.zip'):
+            extracted = extract_pdfs_from_zip(
+                contents,
+                BATCH_MAX_DOCUMENTS - len(documents),
+                BATCH_MAX_TOTAL_SIZE - total_size
             )
-        
-        print(f"📄 Generating {question_count} MCQs from {page_count} pages ({len(text)} chars)...")
-        print(f"🌐 Processing in language: {language}")
-        
-        # Generate MCQs directly in the target language
-        mcqs = make_mcqs(text, language=language, max_questions=question_count)
-        
-        print(f"📝 Generated {len(mcqs)} MCQs")
-        if mcqs:
-            print(f"   First question (preview): {mcqs[0]['question'][:80]}...")
-        
-        # Build flashcards from the generated MCQs so they match exactly
-        print(f"📚 Building {len(mcqs)} flashcards from generated MCQs in {language}...")
-        flashcards = []
-        for idx, m in enumerate(mcqs):
+            total_size += sum(len(pdf) for _, pdf, _ in extracted if pdf is not None)
+            documents.extend(extracted)
+        else:
+            if len(documents) >= BATCH_MAX_DOCUMENTS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"A batch may contain at most {BATCH_MAX_DOCUMENTS} documents"
+                )
+            total_size += len(contents)
+            documents.append((upload.filename, contents, None))
+    
+    if not documents:
+        raise HTTPException(status_code=400, detail="No PDF files found in upload")
+    
+    print(f"📦 [BATCH] {len(documents)} documents, language={language}, questions={question_count}")
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def run_one(filename: str, contents: Optional[bytes], error: Optional[str]) -> dict:
+        async with semaphore:
             try:
-                flashcards.append({
-                    "question": m.get("question", ""),
-                    "answer": m.get("answer", "")
-                })
+                if error is not None:
+                    raise HTTPException(status_code=400, detail=error)
+                validate_pdf_upload(filename, contents)
+                result = await run_in_worker(
+                    process_document, contents, language, question_count, target_languages
+                )
+                return {"filename": filename, "status": "ok", "result": result}
+            except HTTPException as e:
+                return {"filename": filename, "status": "error", "error": e.detail}
             except Exception as e:
-                print(f"⚠️ Error creating flashcard for MCQ {idx}: {e}")
-                # Fallback to a simple flashcard
-                flashcards.append({
-                    "question": m.get("question", ""),
-                    "answer": m.get("answer", "")
-                })
-        
-        # Validate we got some results
-        if not mcqs:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to generate questions from the document. Please check if GEMINI_API_KEY is set."
-            )
+                print(f"❌ [BATCH] Error processing {filename}: {e}")
+                return {"filename": filename, "status": "error", "error": f"Internal server error: {e}"}
+    
+    async def stream_results():
+        tasks = [asyncio.create_task(run_one(*document)) for document in documents]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                succeeded += item["status"] == "ok"
+                yield dumps(item) + b"\n"
+        finally:
+            # Client went away: don't start documents that are still queued
+            for task in tasks:
+                task.cancel()
         
-        return ProcessResponse(
-            text=text[:500] + "..." if len(text) > 500 else text,  # Return preview
-            page_count=page_count,
-            mcqs=mcqs,
-            flashcards=flashcards
+        print(f"📦 [BATCH] Complete: {succeeded}/{len(documents)} succeeded")
+        yield dumps({
+            "done": True,
+            "total": len(documents),
+            "succeeded": succeeded,
+            "failed": len(documents) - succeeded
+        }) + b"\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/documents/{document_id}/more-questions", response_model=MoreQuestionsResponse)
+async def more_questions(
+    request: Request,
+    document_id: str,
+    language: str = Form("English"),
+    question_count: int = Form(5)
+):
+    """
+    Generate additional, non-duplicate questions for a processed PDF.
+    
+    Args:
+        document_id: `document_id` returned by /process-pdf
+        language: Target language for questions
+        question_count: Number of new questions (1-20)
+    """
+    if question_count < 1 or question_count > 20:
+        raise HTTPException(
+            status_code=400,
+            detail="Question count must be between 1 and 20"
         )
-        
+    if not is_document_id(document_id):
+        raise HTTPException(status_code=404, detail="Unknown document. Upload it to /process-pdf first.")
+    
+    try:
+        result = await run_in_worker(generate_more_questions, document_id, language, question_count)
+        return json_response(request, result)
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error processing PDF: {str(e)}")
+        print(f"❌ Error generating more questions: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
 
+def validate_user_id(user_id: str):
+    if not user_id or len(user_id) > MAX_USER_ID_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"user_id must be 1-{MAX_USER_ID_LENGTH} characters"
+        )
+
+@app.post("/progress/events", response_model=ProgressIngestResponse)
+async def ingest_progress_events(batch: ProgressEventBatch):
+    """
+    Record a batch of progress events.
+    
+    The response is sent once the batch is committed. Events carrying an
+    `event_id` that was already stored are ignored, so a failed request can
+    be retried as-is.
+    """
+    if not batch.events:
+        return ProgressIngestResponse(received=0, stored=0)
+    if len(batch.events) > MAX_PROGRESS_EVENTS_PER_REQUEST:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_PROGRESS_EVENTS_PER_REQUEST} events can be sent at once"
+        )
+    
+    events = []
+    for event in batch.events:
+        validate_user_id(event.user_id)
+        if event.kind == ProgressEventKind.ANSWER and event.correct is None:
+            raise HTTPException(status_code=400, detail="Answer events need `correct`")
+        events.append({**event.model_dump(), "kind": event.kind.value})
+    
+    try:
+        future = progress_writer.submit(events)
+    except IngestionOverloaded:
+        raise HTTPException(status_code=503, detail="Progress ingestion is overloaded, retry shortly")
+    
+    try:
+        stored = await asyncio.wrap_future(future)
+    except Exception as e:
+        print(f"❌ Error recording progress events: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to record progress events")
+    return ProgressIngestResponse(received=len(events), stored=stored)
+
+@app.get("/progress/{user_id}", response_model=ProgressData)
+def get_user_progress(user_id: str):
+    """Aggregated progress of a user; users without events get zeros."""
+    validate_user_id(user_id)
+    # A single primary-key read; WAL readers never wait for the writer. It is
+    # still blocking SQLite I/O, so this is a plain function that FastAPI runs
+    # in its threadpool rather than on the event loop
+    return ProgressData(**get_progress(user_id))
+
+# The spaced-repetition endpoints are short SQLite transactions; as plain
+# functions FastAPI runs them in its threadpool, off the event loop and
+# without queueing behind PDF jobs on the worker pool
+@app.post("/srs/{user_id}/cards")
+def add_review_cards(user_id: str, deck: FlashcardDeck):
+    """Add flashcards (e.g. from /process-pdf) to a user's deck, due now."""
+    validate_user_id(user_id)
+    if len(deck.flashcards) > MAX_CARDS_PER_REQUEST:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_CARDS_PER_REQUEST} flashcards can be added at once"
+        )
+    added = add_cards(user_id, [card.model_dump() for card in deck.flashcards], deck.document_id)
+    return {"added": added, "received": len(deck.flashcards)}
+
+@app.get("/srs/{user_id}/due", response_model=DueCardsResponse)
+def get_due_cards(user_id: str, limit: int = 20):
+    """The user's next `limit` due flashcards, most overdue first."""
+    validate_user_id(user_id)
+    if limit < 1 or limit > MAX_DUE_CARDS:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_DUE_CARDS}")
+    cards, next_due_at = due_cards(user_id, limit)
+    return DueCardsResponse(cards=cards, next_due_at=next_due_at)
+
+@app.post("/srs/{user_id}/reviews", response_model=ReviewResponse)
+def record_card_reviews(user_id: str, batch: ReviewBatch):
+    """Record review outcomes (SM-2 quality 0-5) and reschedule the cards."""
+    validate_user_id(user_id)
+    if len(batch.reviews) > MAX_REVIEWS_PER_REQUEST:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_REVIEWS_PER_REQUEST} reviews can be sent at once"
+        )
+    if any(review.quality < 0 or review.quality > 5 for review in batch.reviews):
+        raise HTTPException(status_code=400, detail="quality must be between 0 and 5")
+    
+    recorded, unknown = record_reviews(user_id, [review.model_dump() for review in batch.reviews])
+    return ReviewResponse(recorded=recorded, unknown_cards=unknown)
+
 @app.post("/test-mcq")
 async def test_mcq_generation(text: str, language: str = "English", question_count: int = 5):
     """
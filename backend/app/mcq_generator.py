@@ -1,49 +1,118 @@
 import os
 import json
 import re
+import contextvars
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
-import google.generativeai as genai
+
+from .passage_selector import select_salient_passages
+from .distractor_index import DistractorIndex, build_distractor_index, infer_kind
+from . import llm_client
+
+# Approximate token budget for the document part of the generation prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 1200))
+
+# Languages of a multi-language request are translated in parallel here
+translation_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TRANSLATION_WORKERS", 8)),
+    thread_name_prefix="quillium-translate"
+)
+
+# Last good English set per prompt text, served when the model is unavailable
+ENGLISH_CACHE_SIZE = int(os.getenv("ENGLISH_CACHE_SIZE", 128))
+_english_cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+_english_cache_lock = threading.Lock()
+
+# Static instructions are sent as system instructions so the per-call prompt
+# only carries the document text or the item being translated
+MCQ_SYSTEM_INSTRUCTION = """You write multiple choice questions (MCQs) from a text.
+Rules:
+- Each question has exactly 4 options with ONE correct answer; the answer is one of the options.
+- Questions test real understanding of the text.
+- All options are plausible and specific; never vague ("wrong answer", "someone else", "different perspective").
+- "Who" questions use specific person names as distractors; others use specific facts, terms or concepts.
+Output a JSON array only: [{"question": "...", "answer": "...", "options": ["...", "...", "...", "..."], "difficulty": "easy|medium|hard"}]"""
+
+TRANSLATE_SYSTEM_INSTRUCTION = """You translate one MCQ given as JSON into the requested language.
+Translate "question", "answer" and every item of "options"; the translated answer must equal one of the translated options.
+Keep "difficulty" unchanged. Output only the JSON object with the same keys."""
 
 def init_translator():
     """Dummy function to maintain compatibility with existing imports."""
     print("✅ Translator initialized (using Gemini for translations)")
     return None
 
-def make_mcqs(text: str, language: str = "English", max_questions: int = 20) -> List[Dict]:
+def make_mcqs(
+    text: str,
+    language: str = "English",
+    max_questions: int = 20,
+    distractors: Optional[DistractorIndex] = None
+) -> List[Dict]:
     """Generate MCQs in English first, then translate to target language."""
+    return make_mcqs_multi(text, [language], max_questions, distractors)[language]
+
+def make_mcqs_multi(
+    text: str,
+    languages: List[str],
+    max_questions: int = 20,
+    distractors: Optional[DistractorIndex] = None,
+    prompt_text: Optional[str] = None
+) -> Dict[str, List[Dict]]:
+    """
+    Generate MCQs once in English and translate them into every target language.
+    
+    Translations for different languages run concurrently. Missing options
+    are filled from `distractors`, which is built from the text if not given.
+    The prompt uses `prompt_text` when given, otherwise the most salient
+    passages of `text`.
+    
+    Returns:
+        Dict mapping each requested language to its MCQs
+    """
     
     print(f"\n{'='*70}")
-    print(f"🔧 MAKE_MCQS: Starting with language='{language}', max_questions={max_questions}")
+    print(f"🔧 MAKE_MCQS: Starting with languages={languages}, max_questions={max_questions}")
     print(f"{'='*70}")
     
     # Clean text
     text = text.strip()
     if len(text) < 50:
         print("❌ Text too short (< 50 chars)")
-        return []
+        return {lang: [] for lang in languages}
+    
+    if distractors is None:
+        distractors = build_distractor_index(text)
     
-    # If text is too long, truncate it
-    if len(text) > 6000:
-        print(f"⚠️ Text too long ({len(text)} chars), truncating to 6000")
-        text = text[:6000] + "... [text truncated]"
+    # If text is too long, keep only the most salient passages
+    text = prompt_text or select_salient_passages(text, token_budget=PROMPT_TOKEN_BUDGET)
     
     # Get API key
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
         print("❌ GEMINI_API_KEY not found in environment variables!")
         print("   Please set GEMINI_API_KEY in your .env file")
-        return generate_fallback_mcqs(text, max_questions)
+        fallback = generate_fallback_mcqs(text, max_questions)
+        return {lang: fallback for lang in languages}
     
     print(f"✓ API key loaded: {api_key[:20]}...")
     
     try:
-        # Step 1: ALWAYS generate in English first
+        # Step 1: ALWAYS generate in English first, once for all languages
         print("📝 Step 1: Generating MCQs in English...")
-        english_mcqs = generate_english_mcqs(text, max_questions, api_key)
+        english_mcqs = generate_english_mcqs(text, max_questions, api_key, distractors)
         
-        if not english_mcqs:
+        if english_mcqs:
+            _cache_english_mcqs(text, max_questions, english_mcqs)
+        else:
             print("❌ Failed to generate English MCQs")
-            return generate_fallback_mcqs(text, max_questions)
+            english_mcqs = _cached_english_mcqs(text, max_questions)
+            if not english_mcqs:
+                fallback = generate_fallback_mcqs(text, max_questions)
+                return {lang: fallback for lang in languages}
+            print(f"♻️ Using {len(english_mcqs)} cached English MCQs for this document")
         
         print(f"✅ Step 1 Complete: Generated {len(english_mcqs)} English MCQs")
         
@@ -51,85 +120,120 @@ def make_mcqs(text: str, language: str = "English", max_questions: int = 20) ->
         if english_mcqs:
             print(f"   First Q (EN): {english_mcqs[0]['question'][:60]}...")
         
-        # Step 2: If language is English, return as is
-        if language.lower() == "english":
-            print(f"✅ Language is English, returning MCQs as-is")
-            return english_mcqs[:max_questions]
+        # Step 2: English targets get the generated set as-is
+        results = {}
+        targets = []
+        for lang in languages:
+            if lang.lower() == "english":
+                results[lang] = english_mcqs[:max_questions]
+            else:
+                targets.append(lang)
         
-        # Step 3: Translate to target language
-        print(f"🌍 Step 2: Translating {len(english_mcqs)} MCQs to {language}...")
-        translated_mcqs = translate_mcqs_to_language(english_mcqs, language, api_key)
+        # Step 3: Translate into the remaining languages concurrently
+        if targets:
+            print(f"🌍 Step 2: Translating {len(english_mcqs)} MCQs to {', '.join(targets)}...")
+            futures = {
+                lang: translation_pool.submit(
+                    contextvars.copy_context().run,
+                    translate_mcqs_to_language, english_mcqs, lang, api_key
+                )
+                for lang in targets
+            }
+            for lang, future in futures.items():
+                results[lang] = _checked_translation(english_mcqs, future.result(), lang)[:max_questions]
         
-        if translated_mcqs and len(translated_mcqs) > 0:
-            print(f"✅ Step 2 Complete: Translated to {language}")
-            
-            # Verify translation actually happened
-            if translated_mcqs[0]['question'] != english_mcqs[0]['question']:
-                print(f"   ✓ Confirmed: Question was translated")
-                print(f"   First Q ({language}): {translated_mcqs[0]['question'][:60]}...")
-            else:
-                print(f"   ⚠️ Warning: Question appears unchanged after translation")
-            
-            return translated_mcqs[:max_questions]
-        else:
-            print(f"⚠️ Translation returned empty, using English MCQs")
-            return english_mcqs[:max_questions]
+        return {lang: results[lang] for lang in languages}
         
     except Exception as e:
         print(f"❌ Error in make_mcqs: {e}")
         import traceback
         traceback.print_exc()
-        return generate_fallback_mcqs(text, max_questions)
+        fallback = generate_fallback_mcqs(text, max_questions)
+        return {lang: fallback for lang in languages}
 
-def generate_english_mcqs(text: str, max_questions: int, api_key: str) -> List[Dict]:
-    """Generate MCQs in English using Gemini."""
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash-lite')
-        
-        prompt = f"""
-Generate exactly {max_questions} multiple choice questions (MCQs) from the following text.
-Each question MUST have exactly 4 options, with ONE correct answer.
+def make_english_mcqs(
+    prompt_text: str,
+    max_questions: int,
+    distractors: Optional[DistractorIndex] = None,
+    avoid_questions: Optional[List[str]] = None
+) -> List[Dict]:
+    """Generate English MCQs from already selected prompt text, without translating."""
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        print("❌ GEMINI_API_KEY not found in environment variables!")
+        return generate_fallback_mcqs(prompt_text, max_questions)
+    
+    mcqs = generate_english_mcqs(prompt_text, max_questions, api_key, distractors, avoid_questions)
+    return mcqs or generate_fallback_mcqs(prompt_text, max_questions)
+
+def translate_mcqs(english_mcqs: List[Dict], language: str) -> List[Dict]:
+    """Translate English MCQs to `language`, keeping English if translation isn't possible."""
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if language.lower() == "english" or not english_mcqs or not api_key:
+        return english_mcqs
+    return _checked_translation(english_mcqs, translate_mcqs_to_language(english_mcqs, language, api_key), language)
 
-IMPORTANT RULES:
-1. Make questions MEANINGFUL - test real understanding
-2. Make ALL options PLAUSIBLE and SPECIFIC
-3. NEVER use vague options like: "wrong answer", "incorrect concept", "different perspective"
-4. For "Who" questions: Use SPECIFIC PERSON NAMES as distractors
-5. For other questions: Use SPECIFIC facts/terms/concepts as distractors
+def _cache_key(text: str, max_questions: int) -> str:
+    return f"{hashlib.sha256(text.encode('utf-8')).hexdigest()}:{max_questions}"
 
-FORMAT STRICTLY AS JSON:
-[
-  {{
-    "question": "Question here?",
-    "answer": "Correct answer",
-    "options": ["Correct", "Distractor 1", "Distractor 2", "Distractor 3"],
-    "difficulty": "easy|medium|hard"
-  }}
-]
+def _cache_english_mcqs(text: str, max_questions: int, mcqs: List[Dict]):
+    """Remember the last good English set for a prompt text (LRU)."""
+    key = _cache_key(text, max_questions)
+    with _english_cache_lock:
+        _english_cache[key] = mcqs
+        _english_cache.move_to_end(key)
+        while len(_english_cache) > ENGLISH_CACHE_SIZE:
+            _english_cache.popitem(last=False)
 
-EXAMPLES OF GOOD DISTRACTORS:
-Question: "Who coined the term 'Artificial Intelligence'?"
-Good distractors: ["Alan Turing", "Marvin Minsky", "Herbert Simon"]
-BAD distractors: ["A different scientist", "Not John McCarthy", "Someone else"]
+def _cached_english_mcqs(text: str, max_questions: int) -> Optional[List[Dict]]:
+    with _english_cache_lock:
+        return _english_cache.get(_cache_key(text, max_questions))
 
-TEXT:
-{text}
+def _checked_translation(english_mcqs: List[Dict], translated_mcqs: List[Dict], language: str) -> List[Dict]:
+    """Log whether a translation happened and fall back to English if it came back empty."""
+    if translated_mcqs and len(translated_mcqs) > 0:
+        print(f"✅ Step 2 Complete: Translated to {language}")
+        
+        # Verify translation actually happened
+        if translated_mcqs[0]['question'] != english_mcqs[0]['question']:
+            print(f"   ✓ Confirmed: Question was translated")
+            print(f"   First Q ({language}): {translated_mcqs[0]['question'][:60]}...")
+        else:
+            print(f"   ⚠️ Warning: Question appears unchanged after translation")
+        
+        return translated_mcqs
+    
+    print(f"⚠️ Translation returned empty, using English MCQs")
+    return english_mcqs
 
-Return ONLY the JSON array. No explanations.
-"""
+def generate_english_mcqs(
+    text: str,
+    max_questions: int,
+    api_key: str,
+    distractors: Optional[DistractorIndex] = None,
+    avoid_questions: Optional[List[str]] = None
+) -> List[Dict]:
+    """Generate MCQs in English using Gemini, steering away from `avoid_questions`."""
+    try:
+        prompt = f"Generate exactly {max_questions} MCQs from this text.\n\nTEXT:\n{text}"
+        if avoid_questions:
+            avoid = "\n".join(f"- {q}" for q in avoid_questions)
+            prompt += f"\n\nDo not repeat or rephrase these questions:\n{avoid}"
         
         print("🤖 Generating English MCQs with Gemini...")
         
-        response = model.generate_content(
+        raw_output = llm_client.generate(
             prompt,
+            api_key,
+            system_instruction=MCQ_SYSTEM_INSTRUCTION,
             generation_config={
                 "temperature": 0.3,
                 "max_output_tokens": 4000,
-            }
+                "response_mime_type": "application/json",
+            },
+            purpose="generate",
+            language="English",
         )
-        
-        raw_output = response.text.strip()
         print(f"✅ Received Gemini response")
         
         # Clean JSON
@@ -146,7 +250,7 @@ Return ONLY the JSON array. No explanations.
         # Validate each MCQ
         validated_mcqs = []
         for mcq in mcqs[:max_questions]:
-            validated = validate_mcq(mcq)
+            validated = validate_mcq(mcq, distractors)
             if validated:
                 validated_mcqs.append(validated)
         
@@ -164,9 +268,6 @@ def translate_mcqs_to_language(english_mcqs: List[Dict], target_lang: str, api_k
         return english_mcqs
     
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash-lite')
-        
         print(f"\n{'='*70}")
         print(f"[TRANSLATE] Starting translation of {len(english_mcqs)} MCQs to {target_lang}")
         print(f"{'='*70}\n")
@@ -179,39 +280,20 @@ def translate_mcqs_to_language(english_mcqs: List[Dict], target_lang: str, api_k
                 print(f"[TRANSLATE] MCQ {idx + 1}/{len(english_mcqs)}")
                 print(f"  EN Question: {mcq['question'][:60]}...")
                 
-                # Build individual translation prompt - ULTRA EXPLICIT
-                prompt = f"""You MUST translate this MCQ to {target_lang}. Output ONLY JSON.
-
-English question: {mcq['question']}
-
-STRICT INSTRUCTIONS:
-- Translate the ENTIRE question to {target_lang}
-- Translate the ENTIRE answer to {target_lang}  
-- Translate EVERY option to {target_lang}
-- Make sure the translated answer matches one of the translated options
-- Keep "difficulty" as-is
-- ONLY return valid JSON, no explanations
-
-Here is the English MCQ to translate:
-{json.dumps(mcq, ensure_ascii=False)}
-
-Return ONLY this JSON format with translations in {target_lang}:
-{{
-  "question": "[TRANSLATE TO {target_lang}]",
-  "answer": "[TRANSLATE TO {target_lang}]",
-  "options": ["[TRANSLATE]", "[TRANSLATE]", "[TRANSLATE]", "[TRANSLATE]"],
-  "difficulty": "[KEEP SAME]"
-}}"""
+                prompt = f"Language: {target_lang}\n{json.dumps(mcq, ensure_ascii=False, separators=(',', ':'))}"
                 
-                response = model.generate_content(
+                raw_output = llm_client.generate(
                     prompt,
+                    api_key,
+                    system_instruction=TRANSLATE_SYSTEM_INSTRUCTION,
                     generation_config={
                         "temperature": 0.2,
                         "max_output_tokens": 1000,
-                    }
+                        "response_mime_type": "application/json",
+                    },
+                    purpose="translate",
+                    language=target_lang,
                 )
-                
-                raw_output = response.text.strip()
                 print(f"  Raw response: {raw_output[:100]}...")
                 
                 # Clean JSON
@@ -222,14 +304,23 @@ Return ONLY this JSON format with translations in {target_lang}:
                     translated_mcq = json.loads(raw_output)
                     
                     # Validate
-                    if all(k in translated_mcq for k in ['question', 'answer', 'options']):
+                    if (isinstance(translated_mcq, dict)
+                            and all(k in translated_mcq for k in ['question', 'answer', 'options'])
+                            and isinstance(translated_mcq['options'], list)
+                            and len(translated_mcq['options']) == len(mcq['options'])):
                         # Double check it's actually translated
                         orig_q = mcq['question'].lower()
-                        trans_q = translated_mcq['question'].lower()
+                        trans_q = str(translated_mcq['question']).lower()
                         
                         if orig_q != trans_q:
                             print(f"  ✅ Translated: {translated_mcq['question'][:60]}...")
-                            translated_mcqs.append(translated_mcq)
+                            # Keep exactly the MCQ shape; responses are not re-validated
+                            translated_mcqs.append({
+                                "question": str(translated_mcq['question']),
+                                "answer": str(translated_mcq['answer']),
+                                "options": [str(opt) for opt in translated_mcq['options']],
+                                "difficulty": mcq['difficulty'],
+                            })
                         else:
                             print(f"  ⚠️ Not actually translated, using English")
                             translated_mcqs.append(mcq)
@@ -242,6 +333,11 @@ Return ONLY this JSON format with translations in {target_lang}:
                     print(f"     Response was: {raw_output[:200]}")
                     translated_mcqs.append(mcq)
                     
+            except (llm_client.ModelUnavailable, llm_client.DeadlineExceeded) as e:
+                # Every remaining call would fail the same way; don't wait for them
+                print(f"  ⛔ {e}; keeping English for the remaining {len(english_mcqs) - idx} MCQs")
+                translated_mcqs.extend(english_mcqs[idx:])
+                break
             except Exception as e:
                 print(f"  ❌ Error: {e}")
                 translated_mcqs.append(mcq)
@@ -292,8 +388,8 @@ def clean_json_response(raw_output: str) -> str:
     
     return raw_output
 
-def validate_mcq(mcq: Dict) -> Optional[Dict]:
-    """Validate and clean a single MCQ."""
+def validate_mcq(mcq: Dict, distractors: Optional[DistractorIndex] = None) -> Optional[Dict]:
+    """Validate and clean a single MCQ, filling dropped options from `distractors`."""
     if not mcq or not isinstance(mcq, dict):
         return None
     
@@ -351,13 +447,22 @@ def validate_mcq(mcq: Dict) -> Optional[Dict]:
         seen.add(opt_lower)
         cleaned_options.append(opt_str)
     
-    # Ensure we have 4 quality options
+    # Ensure we have 4 quality options. Fillers start at a position derived
+    # from the question so different questions don't all get the same one
+    base_offset = int(hashlib.sha256(question.lower().encode("utf-8")).hexdigest()[:8], 16)
+    attempt = 0
     while len(cleaned_options) < 4:
-        filler = generate_meaningful_filler(question, answer, len(cleaned_options))
+        filler = generate_meaningful_filler(
+            question, answer, base_offset + len(cleaned_options) + attempt, distractors, seen | {answer.lower()}
+        )
+        attempt += 1
         filler_lower = filler.lower()
         if filler_lower not in seen:
             seen.add(filler_lower)
             cleaned_options.append(filler)
+        elif attempt > 8:
+            # Every filler source is exhausted; number the remaining slots
+            cleaned_options.append(f"Option {len(cleaned_options) + 1}")
     
     # Ensure answer is in cleaned options
     if answer not in cleaned_options:
@@ -380,8 +485,25 @@ def validate_mcq(mcq: Dict) -> Optional[Dict]:
         "difficulty": difficulty
     }
 
-def generate_meaningful_filler(question: str, answer: str, index: int) -> str:
-    """Generate a meaningful filler option."""
+def generate_meaningful_filler(
+    question: str,
+    answer: str,
+    index: int,
+    distractors: Optional[DistractorIndex] = None,
+    exclude: Optional[set] = None
+) -> str:
+    """Generate a meaningful filler option.
+    
+    Prefers a same-type candidate from the document's distractor index and
+    falls back to generic lists when the index has nothing suitable.
+    """
+    if distractors is not None:
+        candidate = distractors.pick(
+            infer_kind(question, answer), exclude or {answer}, offset=index, context=f"{question} {answer}"
+        )
+        if candidate:
+            return candidate
+    
     question_lower = question.lower()
     
     if question_lower.startswith("who"):
@@ -459,12 +581,8 @@ def translate_text(text: str, target_lang: str) -> str:
         return text
     
     try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash-lite')
-        
         prompt = f"Translate this to {target_lang}: {text}"
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return llm_client.generate(prompt, api_key, purpose="translate", language=target_lang)
     except:
         return text
 
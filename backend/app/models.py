@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
 class Difficulty(str, Enum):
@@ -16,16 +16,72 @@ class MCQ(BaseModel):
 class Flashcard(BaseModel):
     question: str
     answer: str
+    # Spaced-repetition card id (derived from question and answer)
+    id: Optional[str] = None
 
 class ProcessRequest(BaseModel):
     language: str = "English"
     question_count: int = 20
 
+class TokenUsage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    calls: int = 0
+
+class UsageReport(BaseModel):
+    total: TokenUsage
+    by_language: Dict[str, TokenUsage] = {}
+
 class ProcessResponse(BaseModel):
+    document_id: Optional[str] = None
     text: str
     page_count: int
     mcqs: List[MCQ]
     flashcards: List[Flashcard]
+    usage: Optional[UsageReport] = None
+
+class LanguageResult(BaseModel):
+    mcqs: List[MCQ]
+    flashcards: List[Flashcard]
+
+class MultiLanguageProcessResponse(BaseModel):
+    document_id: Optional[str] = None
+    text: str
+    page_count: int
+    results: Dict[str, LanguageResult]
+    usage: Optional[UsageReport] = None
+
+class MoreQuestionsResponse(BaseModel):
+    document_id: str
+    mcqs: List[MCQ]
+    flashcards: List[Flashcard]
+    remaining_regions: int
+    # Pages of a large document not extracted yet
+    remaining_pages: int = 0
+    usage: Optional[UsageReport] = None
+
+class ProgressEventKind(str, Enum):
+    ANSWER = "answer"
+    QUIZ_COMPLETED = "quiz_completed"
+    FLASHCARD_STUDIED = "flashcard_studied"
+
+class ProgressEvent(BaseModel):
+    user_id: str
+    kind: ProgressEventKind
+    # Client-generated id; events already stored with this id are ignored
+    event_id: Optional[str] = None
+    correct: Optional[bool] = None
+    document_id: Optional[str] = None
+    question: Optional[str] = None
+    timestamp: Optional[float] = None
+
+class ProgressEventBatch(BaseModel):
+    events: List[ProgressEvent]
+
+class ProgressIngestResponse(BaseModel):
+    received: int
+    stored: int
 
 class ProgressData(BaseModel):
     total_questions: int = 0
@@ -34,7 +90,35 @@ class ProgressData(BaseModel):
     quizzes_taken: int = 0
     flashcards_studied: int = 0
 
+class FlashcardDeck(BaseModel):
+    flashcards: List[Flashcard]
+    document_id: Optional[str] = None
+
+class CardReview(BaseModel):
+    card_id: str
+    # SM-2 recall grade: 0 (blackout) to 5 (perfect)
+    quality: int
+    reviewed_at: Optional[float] = None
+
+class ReviewBatch(BaseModel):
+    reviews: List[CardReview]
+
+class ReviewResponse(BaseModel):
+    recorded: int
+    unknown_cards: List[str]
+
+class DueCardsResponse(BaseModel):
+    cards: List[Flashcard]
+    # When the next card becomes due, if none is due now
+    next_due_at: Optional[float] = None
+
+class BreakerStatus(BaseModel):
+    state: str
+    consecutive_failures: int
+    retry_in_seconds: Optional[float] = None
+
 class HealthResponse(BaseModel):
     status: str
     translator_loaded: bool
-    model_cache_exists: bool
\ No newline at end of file
+    model_cache_exists: bool
+    model_breaker: Optional[BreakerStatus] = None
\ No newline at end of file
@@ -0,0 +1,223 @@
+import re
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+# Rough characters-per-token ratio for English prose with Gemini tokenizers
+CHARS_PER_TOKEN = 4
+
+# Sentence ends, including the CJK full stop and fullwidth marks
+_SENTENCE = re.compile(r'[^.!?。！？]*[.!?。！？]+|[^.!?。！？]+$')
+_SEPARATOR = "\x00"
+# Word runs of any script (three characters or more), plus the separator
+# placed between passages
+_TOKEN = re.compile(r'\w{3,}|\x00')
+# A content word starts at the first letter of a run
+_WORD = re.compile(r'[^\W\d_]\w*')
+# For all-ASCII text the same runs come from translate + split, which is
+# several times faster than the regex; short runs are dropped later. Every
+# character maps to one character so translate stays on its fast path
+_ASCII_RUNS = {
+    code: chr(code) if chr(code).isalnum() or code in (0, 95) else " "
+    for code in range(128)
+}
+
+# Bytes that count as noise in a passage: digits and dots
+_NOISY = np.zeros(256, dtype=bool)
+_NOISY[list(b"0123456789.")] = True
+
+STOPWORDS = frozenset("""
+about above after again against all also among and any are because been before
+being below between both but can could did does doing down during each few for
+from further had has have having her here hers herself him himself his how into
+its itself just more most not now off once only other our ours ourselves out over
+own same she should some such than that the their theirs them themselves then
+there these they this those through too under until very was were what when
+where which while who whom why will with would you your yours yourself
+""".split())
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgeting."""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def split_passage_spans(text: str, min_chars: int = 40, max_chars: int = 600) -> List[Tuple[int, int]]:
+    """Split cleaned text into sentence-sized passages, as (start, end) offsets.
+
+    Very short fragments are merged into the following sentence and very long
+    runs (text without punctuation) are hard-wrapped so that a single passage
+    can never swallow the whole budget.
+    """
+    spans = []
+    pending = None
+    end = 0
+    for match in _SENTENCE.finditer(text):
+        start, end = match.span()
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start == end:
+            continue
+        if pending is None:
+            pending = start
+        if end - pending < min_chars:
+            continue
+        while end - pending > max_chars:
+            cut = text.rfind(" ", pending, pending + max_chars)
+            cut = cut if cut > pending + min_chars else pending + max_chars
+            spans.append((pending, cut))
+            pending = cut
+            while pending < end and text[pending].isspace():
+                pending += 1
+        if pending < end:
+            spans.append((pending, end))
+        pending = None
+    if pending is not None and pending < end:
+        spans.append((pending, end))
+    return spans
+
+
+def split_passages(text: str, min_chars: int = 40, max_chars: int = 600) -> List[str]:
+    """Split cleaned text into sentence-sized passages."""
+    return [text[start:end] for start, end in split_passage_spans(text, min_chars, max_chars)]
+
+
+def score_passages(passages: List[str]) -> np.ndarray:
+    """Score passages by TF-IDF centrality.
+
+    Each passage is a sparse TF-IDF vector; its score is the cosine similarity
+    to the document centroid, damped for passages that look like tables of
+    contents or front matter (mostly digits, dots or very few content words).
+    """
+    n = len(passages)
+    if n == 0:
+        return np.zeros(0)
+
+    # Everything below works on one joined copy of the passages so tokenizing
+    # and the noise count are single passes in C, not per-passage calls.
+    # Every passage, the last included, is followed by the separator
+    joined = _SEPARATOR.join(passages) + _SEPARATOR
+    char_lengths = np.fromiter(map(len, passages), dtype=np.int64, count=n)
+    ends = np.cumsum(char_lengths + 1) - 1
+    starts = ends - char_lengths
+
+    # Digits and dots, summed over each passage and its separator. Non-ASCII
+    # characters become "?", one byte each, so str offsets still apply
+    encoded = joined.encode("ascii", "replace")
+    noisy = _NOISY[np.frombuffer(encoded, dtype=np.uint8)]
+    noise = np.add.reduceat(noisy, starts, dtype=np.int64).astype(np.float64)
+
+    # Number the distinct runs; counting separators gives each run's passage
+    lowered = joined.lower()
+    if lowered.isascii():
+        runs = lowered.translate(_ASCII_RUNS).replace(_SEPARATOR, f" {_SEPARATOR} ").split()
+    else:
+        runs = _TOKEN.findall(lowered)
+    run_ids = {}
+    for run in dict.fromkeys(runs):
+        run_ids[run] = len(run_ids)
+    ids = np.fromiter(map(run_ids.__getitem__, runs), dtype=np.int64, count=len(runs))
+    rows = np.cumsum(ids == run_ids[_SEPARATOR])
+
+    # Map each distinct run to its content word (leading digits dropped),
+    # or mark it as dropped: too short, a stopword, or the separator
+    vocab = {}
+    term_of_run = np.zeros(len(run_ids), dtype=np.int64)
+    is_content = np.zeros(len(run_ids), dtype=bool)
+    for run, run_id in run_ids.items():
+        match = _WORD.search(run)
+        word = match.group() if match else ""
+        if len(word) >= 3 and word not in STOPWORDS:
+            term_of_run[run_id] = vocab.setdefault(word, len(vocab))
+            is_content[run_id] = True
+    vocab_size = len(vocab)
+
+    keep = is_content[ids]
+    terms, rows = term_of_run[ids[keep]], rows[keep]
+    lengths = np.bincount(rows, minlength=n)
+    if terms.size == 0:
+        return np.zeros(n)
+
+    # Collapse (passage, term) duplicates into sparse term-frequency entries
+    keys, tf = np.unique(rows * vocab_size + terms, return_counts=True)
+    rows = keys // vocab_size
+    terms = keys % vocab_size
+
+    df = np.bincount(terms, minlength=vocab_size)
+    idf = np.log((1 + n) / (1 + df)) + 1.0
+    weights = (1.0 + np.log(tf)) * idf[terms]
+
+    norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=n))
+    norms[norms == 0] = 1.0
+    unit = weights / norms[rows]
+
+    centroid = np.bincount(terms, weights=unit, minlength=vocab_size)
+    centroid /= np.linalg.norm(centroid) or 1.0
+
+    scores = np.bincount(rows, weights=unit * centroid[terms], minlength=n)
+
+    # Penalise boilerplate: TOC lines, page ranges, headings with no prose
+    prose_ratio = 1.0 - noise / np.maximum(char_lengths, 1.0)
+    density = np.minimum(lengths / 8.0, 1.0)
+    return scores * prose_ratio * density
+
+
+def select_salient_spans(text: str, token_budget: int = 1200) -> List[Tuple[int, int]]:
+    """
+    Pick the most central passages of a document within a token budget.
+
+    Args:
+        text: Cleaned document text
+        token_budget: Approximate number of tokens the selection may use
+
+    Returns:
+        (start, end) offsets of the chosen passages, in document order
+    """
+    if estimate_tokens(text) <= token_budget:
+        return [(0, len(text))]
+
+    start = time.perf_counter()
+    spans = split_passage_spans(text)
+    passages = [text[s:e] for s, e in spans]
+    scores = score_passages(passages)
+
+    char_budget = token_budget * CHARS_PER_TOKEN
+    chosen = []
+    used = 0
+    seen = set()
+    for idx in np.argsort(-scores, kind="stable"):
+        passage = passages[idx]
+        key = passage.lower()
+        if key in seen or used + len(passage) + 1 > char_budget:
+            continue
+        seen.add(key)
+        chosen.append(idx)
+        used += len(passage) + 1
+        if used >= char_budget * 0.95:
+            break
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"🎯 Selected {len(chosen)}/{len(passages)} passages "
+          f"({used}/{len(text)} chars) in {elapsed_ms:.1f} ms")
+    return [spans[i] for i in sorted(chosen)]
+
+
+def join_spans(text: str, spans: List[Tuple[int, int]]) -> str:
+    return " ".join(text[start:end] for start, end in spans)
+
+
+def select_salient_passages(text: str, token_budget: int = 1200) -> str:
+    """
+    Build prompt text from the most central passages of a document.
+
+    Args:
+        text: Cleaned document text
+        token_budget: Approximate number of tokens the result may use
+
+    Returns:
+        Top-ranked passages within budget, joined in document order
+    """
+    return join_spans(text, select_salient_spans(text, token_budget))
@@ -1,25 +1,139 @@
 import fitz  # PyMuPDF
 import re
-from typing import Tuple, Optional
+from collections import Counter
+from typing import Iterable, Iterator, List, Set, Tuple, Optional
 import io
 
+# Lines this close to the top or bottom of a page are header/footer candidates
+EDGE_LINES = 3
+# A candidate is boilerplate when it recurs at the same position on at least
+# this share of the pages, and on at least MIN_REPEAT_PAGES pages
+REPEAT_FRACTION = 0.3
+MIN_REPEAT_PAGES = 3
+
+_DIGITS = re.compile(r'\d+')
+# A line that is only a page number ("12", "Page 12", "12 of 80")
+_PAGE_NUMBER = re.compile(r'^(?:page\s+)?\d+(?:\s*(?:/|of)\s*\d+)?$', re.IGNORECASE)
+
 def clean_text(text: str) -> str:
     """Clean extracted text."""
-    # Remove excessive whitespace
+    # Handle hyphenated line breaks
+    text = re.sub(r'-\n', '', text)
+    # Remove excessive whitespace (this also joins the lines)
     text = re.sub(r'\s+', ' ', text)
-    # Remove common PDF artifacts
-    text = re.sub(r'-\n', '', text)  # Handle hyphenated line breaks
-    text = re.sub(r'\n', ' ', text)  # Replace newlines with spaces
-    # Remove page numbers and headers/footers (simple pattern)
-    text = re.sub(r'\b\d+\b\s*$', '', text, flags=re.MULTILINE)
     # Remove special characters but keep basic punctuation
     text = re.sub(r'[^\w\s.,;:!?()-]', '', text)
     return text.strip()
 
+def _line_key(line: str) -> str:
+    """Normalize a line so running headers match across pages ("Page 3" == "Page 4")."""
+    return _DIGITS.sub('#', ' '.join(line.lower().split()))
+
+def _edge_keys(lines: List[str]) -> List[Tuple[int, int, str]]:
+    """(line index, position, key) for the lines at the top and bottom of a page.
+
+    Positions count from the top (0, 1, ...) or from the bottom (-1, -2, ...).
+    """
+    count = len(lines)
+    edges = []
+    for i in range(count):
+        if i < EDGE_LINES:
+            edges.append((i, i, _line_key(lines[i])))
+        if i >= count - EDGE_LINES:
+            edges.append((i, i - count, _line_key(lines[i])))
+    return edges
+
+def _strip_page_number(lines: List[str]) -> List[str]:
+    """Drop a page number standing alone as the first or last line of a page.
+    
+    Number-only lines in the body (years in a timeline, table values) are kept.
+    """
+    if lines and _PAGE_NUMBER.match(lines[-1]):
+        lines = lines[:-1]
+    if lines and _PAGE_NUMBER.match(lines[0]):
+        lines = lines[1:]
+    return lines
+
+def strip_repeated_lines(
+    pages: List[List[str]],
+    known_repeated: Iterable[Tuple[int, str]] = ()
+) -> Tuple[List[List[str]], int, Set[Tuple[int, str]]]:
+    """
+    Remove page numbers, running headers and footers from per-page lines.
+    
+    A line counts as a header/footer when the same normalized text sits at the
+    same distance from the top or bottom on enough pages. Too few pages to
+    tell are still cleaned with `known_repeated`, learned from earlier pages
+    of the same document.
+    
+    Args:
+        pages: Lines of each page, in reading order
+        known_repeated: (position, key) pairs already known to be boilerplate
+        
+    Returns:
+        Tuple of (pages without repeated lines, characters removed,
+        (position, key) pairs removed, known ones included)
+    """
+    original_chars = sum(len(line) for lines in pages for line in lines)
+    pages = [_strip_page_number(lines) for lines in pages]
+    removed = original_chars - sum(len(line) for lines in pages for line in lines)
+    
+    edges = [_edge_keys(lines) for lines in pages]
+    repeated = set(known_repeated)
+    if len(pages) >= MIN_REPEAT_PAGES:
+        counts = Counter()
+        for page_edges in edges:
+            counts.update({(position, key) for _, position, key in page_edges})
+        threshold = max(MIN_REPEAT_PAGES, REPEAT_FRACTION * len(pages))
+        repeated.update(edge for edge, count in counts.items() if count >= threshold)
+    if not repeated:
+        return pages, removed, repeated
+    
+    stripped = []
+    for lines, page_edges in zip(pages, edges):
+        drop = {i for i, position, key in page_edges if (position, key) in repeated}
+        removed += sum(len(lines[i]) for i in drop)
+        stripped.append([line for i, line in enumerate(lines) if i not in drop])
+    return stripped, removed, repeated
+
+def _page_lines(page) -> List[str]:
+    """Non-empty lines of a page in visual (top to bottom) order."""
+    lines = []
+    # Sorting blocks is much cheaper than get_text("text", sort=True)
+    for block in page.get_text("blocks", sort=True):
+        if block[6] != 0:  # Image block
+            continue
+        for line in block[4].splitlines():
+            line = line.strip()
+            if line:
+                lines.append(line)
+    return lines
+
+def _join_pages(page_numbers: List[int], pages: List[List[str]]) -> Tuple[str, List[Tuple[int, int, int]]]:
+    """Clean and join page lines, recording where each page ends up in the text.
+    
+    Blank pages get an empty (start == end) range.
+    """
+    parts = []
+    offsets = []
+    pos = 0
+    for page_num, lines in zip(page_numbers, pages):
+        page_text = clean_text("\n".join(lines))
+        if page_text and parts:
+            pos += 1  # Joining space
+        offsets.append((page_num, pos, pos + len(page_text)))
+        if page_text:
+            parts.append(page_text)
+            pos += len(page_text)
+    return " ".join(parts), offsets
+
 def extract_text_from_pdf(file_content: bytes) -> Tuple[str, int]:
     """
     Extract text from PDF bytes.
     
+    Running headers, footers and page numbers are removed before the pages
+    are joined.
+    
     Args:
         file_content: PDF file bytes
         
@@ -30,20 +144,18 @@ def extract_text_from_pdf(file_content: bytes) -> Tuple[str, int]:
         # Open PDF from bytes
         doc = fitz.open(stream=file_content, filetype="pdf")
         page_count = doc.page_count
-        full_text = ""
         
         print(f"📄 Processing {page_count} pages...")
         
-        for page_num in range(page_count):
-            page = doc[page_num]
-            page_text = page.get_text("text").strip()
-            if page_text:
-                full_text += page_text + " "
-        
+        pages = [_page_lines(doc[page_num]) for page_num in range(page_count)]
         doc.close()
         
+        pages, removed, _ = strip_repeated_lines(pages)
+        if removed:
+            print(f"🧹 Removed {removed} characters of page numbers and repeated headers/footers")
+        
         # Clean the text
-        full_text = clean_text(full_text)
+        full_text, _ = _join_pages(list(range(page_count)), pages)
         
         if len(full_text.strip()) < 50:
             return "This document contains minimal text. Please try a document with more content.", page_count
@@ -53,4 +165,82 @@ def extract_text_from_pdf(file_content: bytes) -> Tuple[str, int]:
         
     except Exception as e:
         print(f"❌ PDF processing error: {e}")
-        return f"Error processing PDF: {str(e)}", 0
\ No newline at end of file
+        return f"Error processing PDF: {str(e)}", 0
+
+def sample_page_order(page_count: int) -> Iterator[int]:
+    """
+    Page numbers ordered so that every prefix is spread evenly over the document.
+    
+    Visits the pages at fractions 0, 1/2, 1/4, 3/4, 1/8, ... of the document
+    (bit-reversed order) until every page has been listed once.
+    """
+    if page_count <= 0:
+        return
+    bits = max(1, (page_count - 1).bit_length())
+    size = 1 << bits
+    seen = set()
+    for i in range(size):
+        page_num = int(format(i, f'0{bits}b')[::-1], 2) * page_count // size
+        if page_num not in seen:
+            seen.add(page_num)
+            yield page_num
+
+def extract_text_sample(
+    file_content: bytes,
+    char_budget: int,
+    skip_pages: Iterable[int] = (),
+    known_repeated: Iterable[Tuple[int, str]] = ()
+) -> Tuple[str, int, List[Tuple[int, int, int]], List[Tuple[int, str]]]:
+    """
+    Extract evenly spread pages until about `char_budget` characters are read.
+    
+    Only the pages needed for the budget are touched, so large documents cost
+    a fraction of a full extraction. Documents smaller than the budget are
+    extracted completely.
+    
+    Args:
+        file_content: PDF file bytes
+        char_budget: Characters of page text to collect
+        skip_pages: Page numbers extracted earlier (for fetching more later)
+        known_repeated: Header/footer lines found in those earlier pages
+        
+    Returns:
+        Tuple of (extracted_text, page_count, page_offsets, repeated), where
+        page_offsets lists (page number, start, end) of every page read, in
+        document order, and repeated lists the header/footer (position, key)
+        pairs known so far, to pass back in with the next skip_pages
+    """
+    try:
+        doc = fitz.open(stream=file_content, filetype="pdf")
+        page_count = doc.page_count
+        skip = set(skip_pages)
+        
+        sampled = {}
+        collected = 0
+        for page_num in sample_page_order(page_count):
+            if page_num in skip:
+                continue
+            lines = _page_lines(doc[page_num])
+            sampled[page_num] = lines
+            collected += sum(len(line) for line in lines)
+            if collected >= char_budget:
+                break
+        doc.close()
+        
+        page_numbers = sorted(sampled)
+        pages, removed, repeated = strip_repeated_lines(
+            [sampled[page_num] for page_num in page_numbers], known_repeated
+        )
+        if removed:
+            print(f"🧹 Removed {removed} characters of page numbers and repeated headers/footers")
+        
+        text, offsets = _join_pages(page_numbers, pages)
+        print(f"📑 Extracted {len(text)} characters from {len(page_numbers)} of {page_count} pages")
+        
+        if not skip and len(text) < 50:
+            return "This document contains minimal text. Please try a document with more content.", page_count, [], []
+        return text, page_count, offsets, sorted(repeated)
+        
+    except Exception as e:
+        print(f"❌ PDF processing error: {e}")
+        return f"Error processing PDF: {str(e)}", 0, [], []
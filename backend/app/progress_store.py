@@ -0,0 +1,238 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+# SQLite database for progress events and per-user aggregates
+PROGRESS_DB_PATH = os.getenv("PROGRESS_DB_PATH", "progress.db")
+
+# Upper bound on events written in one transaction
+GROUP_COMMIT_MAX_EVENTS = int(os.getenv("GROUP_COMMIT_MAX_EVENTS", 5000))
+# Batches waiting for the writer before ingestion is refused (backpressure)
+MAX_PENDING_BATCHES = int(os.getenv("MAX_PENDING_BATCHES", 10000))
+
+ANSWER = "answer"
+QUIZ_COMPLETED = "quiz_completed"
+FLASHCARD_STUDIED = "flashcard_studied"
+
+# Aggregate columns each event kind increments
+AGGREGATE_COLUMNS = (
+    "total_questions", "correct_answers", "incorrect_answers", "quizzes_taken", "flashcards_studied"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS progress_events (
+    seq INTEGER PRIMARY KEY,
+    event_id TEXT UNIQUE,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    correct INTEGER,
+    document_id TEXT,
+    question TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_progress (
+    user_id TEXT PRIMARY KEY,
+    total_questions INTEGER NOT NULL DEFAULT 0,
+    correct_answers INTEGER NOT NULL DEFAULT 0,
+    incorrect_answers INTEGER NOT NULL DEFAULT 0,
+    quizzes_taken INTEGER NOT NULL DEFAULT 0,
+    flashcards_studied INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+_INSERT_EVENT = """
+INSERT OR IGNORE INTO progress_events
+    (event_id, user_id, kind, correct, document_id, question, created_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_UPSERT_PROGRESS = f"""
+INSERT INTO user_progress (user_id, {", ".join(AGGREGATE_COLUMNS)}, updated_at)
+VALUES (?, {", ".join("?" for _ in AGGREGATE_COLUMNS)}, ?)
+ON CONFLICT(user_id) DO UPDATE SET
+    {", ".join(f"{c} = {c} + excluded.{c}" for c in AGGREGATE_COLUMNS)},
+    updated_at = excluded.updated_at
+"""
+
+
+class IngestionOverloaded(Exception):
+    """Raised when the writer queue is full."""
+
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Open a connection to the progress database in WAL mode.
+
+    WAL lets readers run while the writer commits. With synchronous=NORMAL
+    a commit survives an application crash; only a power loss can drop the
+    last few commits.
+    """
+    conn = sqlite3.connect(path or PROGRESS_DB_PATH, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def event_deltas(event: Dict) -> Tuple[int, int, int, int, int]:
+    """Aggregate increments for one event, in AGGREGATE_COLUMNS order."""
+    kind = event["kind"]
+    if kind == ANSWER:
+        correct = bool(event.get("correct"))
+        return 1, int(correct), int(not correct), 0, 0
+    if kind == QUIZ_COMPLETED:
+        return 0, 0, 0, 1, 0
+    if kind == FLASHCARD_STUDIED:
+        return 0, 0, 0, 0, 1
+    raise ValueError(f"Unknown progress event kind: {kind}")
+
+
+def write_events(conn: sqlite3.Connection, batches: List[List[Dict]]) -> List[int]:
+    """
+    Append events and update per-user aggregates in a single transaction.
+
+    Events whose event_id was already stored are skipped, so clients can
+    safely retry a batch.
+
+    Returns:
+        Number of newly stored events per batch
+    """
+    now = time.time()
+    totals: Dict[str, List[int]] = {}
+    stored = []
+    with conn:
+        for events in batches:
+            count = 0
+            for event in events:
+                cursor = conn.execute(_INSERT_EVENT, (
+                    event.get("event_id"),
+                    event["user_id"],
+                    event["kind"],
+                    None if event.get("correct") is None else int(event["correct"]),
+                    event.get("document_id"),
+                    event.get("question"),
+                    event.get("timestamp") or now,
+                ))
+                if cursor.rowcount:
+                    count += 1
+                    user_totals = totals.setdefault(event["user_id"], [0] * len(AGGREGATE_COLUMNS))
+                    for i, delta in enumerate(event_deltas(event)):
+                        user_totals[i] += delta
+            stored.append(count)
+        conn.executemany(
+            _UPSERT_PROGRESS,
+            [(user_id, *user_totals, now) for user_id, user_totals in totals.items()]
+        )
+    return stored
+
+
+class ProgressWriter:
+    """
+    Single background writer that group-commits queued event batches.
+
+    Request handlers enqueue a batch and wait on a Future; the writer takes
+    everything queued since its last commit (up to GROUP_COMMIT_MAX_EVENTS)
+    and writes it in one transaction, so the commit cost is shared by all
+    concurrent requests instead of paid per request.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._queue: "queue.Queue" = queue.Queue(maxsize=MAX_PENDING_BATCHES)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.commits = 0
+        self.events_written = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="quillium-progress-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Flush queued batches and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, events: List[Dict]) -> Future:
+        """Queue a batch of events; the Future resolves to the number stored."""
+        self.start()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((events, future))
+        except queue.Full:
+            raise IngestionOverloaded("Progress writer queue is full")
+        return future
+
+    def _next_group(self) -> Tuple[List, bool]:
+        """Block for one batch, then take whatever else is already queued."""
+        group = []
+        first = self._queue.get()
+        if first is None:
+            return group, True
+        group.append(first)
+        size = len(first[0])
+        while size < GROUP_COMMIT_MAX_EVENTS:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return group, True
+            group.append(item)
+            size += len(item[0])
+        return group, False
+
+    def _run(self):
+        conn = connect(self.path)
+        print(f"🗃️ Progress writer started ({self.path or PROGRESS_DB_PATH})")
+        try:
+            stopping = False
+            while not stopping:
+                group, stopping = self._next_group()
+                if not group:
+                    continue
+                try:
+                    stored = write_events(conn, [events for events, _ in group])
+                except Exception as e:
+                    print(f"❌ Progress commit of {len(group)} batches failed: {e}")
+                    for _, future in group:
+                        future.set_exception(e)
+                    continue
+                self.commits += 1
+                self.events_written += sum(stored)
+                for (_, future), count in zip(group, stored):
+                    future.set_result(count)
+        finally:
+            conn.close()
+
+
+progress_writer = ProgressWriter()
+_local = threading.local()
+
+
+def local_connection() -> sqlite3.Connection:
+    """Connection owned by the calling thread, for reads and short transactions."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = connect()
+    return conn
+
+
+def get_progress(user_id: str) -> Dict:
+    """Aggregated progress of one user (a primary-key lookup, no event scan)."""
+    row = local_connection().execute(
+        f"SELECT {', '.join(AGGREGATE_COLUMNS)} FROM user_progress WHERE user_id = ?",
+        (user_id,)
+    ).fetchone()
+    return dict(zip(AGGREGATE_COLUMNS, row or (0,) * len(AGGREGATE_COLUMNS)))
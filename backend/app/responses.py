@@ -0,0 +1,76 @@
+import gzip
+import json
+import os
+from typing import Any, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize plain JSON data (dicts, lists, str, numbers) to UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _accepted_encodings(accept_encoding: str) -> dict:
+    """Parse an Accept-Encoding header into {encoding: q}."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def compress(body: bytes, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+    """Compress body with the best encoding the client accepts (brotli, then gzip)."""
+    if len(body) < COMPRESSION_MIN_SIZE or not accept_encoding:
+        return body, None
+
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), "gzip"
+    return body, None
+
+
+def json_response(request: Request, content: Any, status_code: int = 200) -> Response:
+    """
+    Build a JSON response from data we produced ourselves.
+
+    The content is serialized as-is (no pydantic re-validation) and compressed
+    when it is large enough and the client accepts it.
+    """
+    body, encoding = compress(dumps(content), request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,352 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .passage_selector import CHARS_PER_TOKEN, score_passages, split_passage_spans
+
+# One JSON file per document, named by the SHA-256 of the PDF bytes
+SESSION_DIR = os.getenv("SESSION_DIR", "sessions")
+# Sessions (and kept PDFs) unused for this many seconds are deleted
+SESSION_TTL = float(os.getenv("SESSION_TTL", 7 * 24 * 60 * 60))
+
+# Target size of the regions follow-up questions are drawn from; one region
+# is about the smallest follow-up prompt
+CHUNK_CHARS = 1200
+# Share of a chunk that must have been in a prompt for it to count as covered
+COVERED_FRACTION = 0.25
+
+_DOCUMENT_ID = re.compile(r'^[0-9a-f]{64}$')
+# Locks disappear once no request holds them, so the map doesn't grow with
+# every document ever uploaded
+_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_locks_guard = threading.Lock()
+# Chunks handed to follow-up generations that are still running
+_reserved: Dict[str, Set[int]] = {}
+
+
+def document_id(contents: bytes) -> str:
+    """Stable id of an uploaded PDF."""
+    return hashlib.sha256(contents).hexdigest()
+
+
+def is_document_id(doc_id: str) -> bool:
+    return bool(_DOCUMENT_ID.match(doc_id))
+
+
+def session_lock(doc_id: str) -> threading.Lock:
+    """Per-document lock so concurrent follow-ups don't issue the same region twice."""
+    with _locks_guard:
+        return _locks.setdefault(doc_id, threading.Lock())
+
+
+def reserve_chunks(doc_id: str, chunk_ids: List[int]):
+    """Keep chunks away from concurrent follow-ups while a generation runs.
+
+    Call with the session lock held.
+    """
+    _reserved.setdefault(doc_id, set()).update(chunk_ids)
+
+
+def release_chunks(doc_id: str, chunk_ids: List[int]):
+    """Undo reserve_chunks. Call with the session lock held."""
+    reserved = _reserved.get(doc_id)
+    if reserved is None:
+        return
+    reserved.difference_update(chunk_ids)
+    if not reserved:
+        del _reserved[doc_id]
+
+
+def _path(doc_id: str) -> str:
+    if not is_document_id(doc_id):
+        raise ValueError(f"Invalid document id: {doc_id}")
+    return os.path.join(SESSION_DIR, f"{doc_id}.json")
+
+
+def _pdf_path(doc_id: str) -> str:
+    return os.path.splitext(_path(doc_id))[0] + ".pdf"
+
+
+def chunk_text(text: str, chunk_chars: int = CHUNK_CHARS) -> List[Tuple[int, int]]:
+    """Group passages into roughly chunk_chars-sized (start, end) regions.
+
+    A leftover tail under half a chunk is merged into the previous chunk so
+    that no region is a stray fragment.
+    """
+    chunks = []
+    chunk_start = None
+    chunk_end = 0
+    for start, end in split_passage_spans(text):
+        if chunk_start is None:
+            chunk_start = start
+        chunk_end = end
+        if chunk_end - chunk_start >= chunk_chars:
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = None
+    if chunk_start is not None:
+        if chunks and chunk_end - chunk_start < chunk_chars // 2:
+            chunks[-1] = (chunks[-1][0], chunk_end)
+        else:
+            chunks.append((chunk_start, chunk_end))
+    return chunks or [(0, len(text))]
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r'\W+', ' ', question.lower()).strip()
+
+
+def create_session(
+    doc_id: str,
+    text: str,
+    page_count: int,
+    page_offsets: List[Tuple[int, int, int]],
+    repeated_lines: Optional[List[Tuple[int, str]]] = None
+) -> Dict:
+    """
+    Start a session for a freshly extracted document.
+
+    Args:
+        page_offsets: (page, start, end) of every page extracted into `text`
+        repeated_lines: Header/footer (position, key) pairs found while
+            extracting, applied again when more pages are read
+    """
+    return {
+        "document_id": doc_id,
+        "created_at": time.time(),
+        "page_count": page_count,
+        "text": text,
+        "chunks": chunk_text(text),
+        "pages": page_offsets,
+        "repeated_lines": repeated_lines or [],
+        "covered_chunks": [],
+        "questions": [],
+    }
+
+
+def _expired(path: str, now: float) -> bool:
+    """Whether a file was last written more than SESSION_TTL ago (saves refresh it)."""
+    try:
+        return now - os.path.getmtime(path) > SESSION_TTL
+    except FileNotFoundError:
+        return False
+
+
+def load_session(doc_id: str) -> Optional[Dict]:
+    """Load a session; expired sessions are deleted and reported as missing."""
+    path = _path(doc_id)
+    if _expired(path, time.time()):
+        delete_session(doc_id)
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            session = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    session["chunks"] = [tuple(chunk) for chunk in session["chunks"]]
+    if "pages" in session:
+        session["pages"] = [tuple(page) for page in session["pages"]]
+    if "repeated_lines" in session:
+        session["repeated_lines"] = [tuple(edge) for edge in session["repeated_lines"]]
+    return session
+
+
+def save_session(session: Dict):
+    """Write a session atomically (temp file + rename)."""
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    path = _path(session["document_id"])
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(session, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def save_document(doc_id: str, contents: bytes):
+    """Keep the PDF so pages that were not extracted yet can be read later."""
+    os.makedirs(SESSION_DIR, exist_ok=True)
+    path = _pdf_path(doc_id)
+    if os.path.exists(path):
+        return
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(contents)
+    os.replace(tmp_path, path)
+
+
+def load_document(doc_id: str) -> Optional[bytes]:
+    try:
+        with open(_pdf_path(doc_id), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def delete_document(doc_id: str):
+    """Remove a kept PDF once every page has been extracted."""
+    try:
+        os.remove(_pdf_path(doc_id))
+    except FileNotFoundError:
+        pass
+
+
+def delete_session(doc_id: str):
+    delete_document(doc_id)
+    try:
+        os.remove(_path(doc_id))
+    except FileNotFoundError:
+        pass
+
+
+def prune_sessions() -> int:
+    """
+    Delete sessions not saved within SESSION_TTL, with their kept PDFs.
+
+    Returns:
+        Number of documents removed
+    """
+    try:
+        names = os.listdir(SESSION_DIR)
+    except FileNotFoundError:
+        return 0
+
+    now = time.time()
+    doc_ids = {name.split(".", 1)[0] for name in names if name.endswith((".json", ".pdf"))}
+    removed = 0
+    for doc_id in filter(is_document_id, doc_ids):
+        with session_lock(doc_id):
+            json_path = _path(doc_id)
+            # A PDF without a session is judged by its own age
+            path = json_path if os.path.exists(json_path) else _pdf_path(doc_id)
+            if _expired(path, now):
+                delete_session(doc_id)
+                removed += 1
+    if removed:
+        print(f"🗑️ Pruned {removed} expired document sessions")
+    return removed
+
+
+def unextracted_pages(session: Dict) -> int:
+    # Sessions created before lazy extraction hold the whole document
+    if "pages" not in session:
+        return 0
+    return session["page_count"] - len(session["pages"])
+
+
+def extracted_pages(session: Dict) -> List[int]:
+    return [page for page, _, _ in session.get("pages", [])]
+
+
+def append_text(session: Dict, text: str, page_offsets: List[Tuple[int, int, int]]):
+    """Add text from newly extracted pages as new, uncovered chunks."""
+    base = len(session["text"]) + 1 if session["text"] and text else len(session["text"])
+    if text:
+        session["text"] = f"{session['text']} {text}" if session["text"] else text
+        session["chunks"].extend((start + base, end + base) for start, end in chunk_text(text))
+    session["pages"].extend((page, start + base, end + base) for page, start, end in page_offsets)
+
+
+def uncovered_chars(session: Dict) -> int:
+    return sum(end - start for start, end in (session["chunks"][i] for i in uncovered_chunks(session)))
+
+
+def chunks_for_spans(session: Dict, spans: List[Tuple[int, int]]) -> List[int]:
+    """Indices of the chunks whose text was substantially used by the given spans."""
+    used = {}
+    for start, end in spans:
+        for idx, (chunk_start, chunk_end) in enumerate(session["chunks"]):
+            overlap = min(end, chunk_end) - max(start, chunk_start)
+            if overlap > 0:
+                used[idx] = used.get(idx, 0) + overlap
+    return sorted(
+        idx for idx, chars in used.items()
+        if chars >= COVERED_FRACTION * (session["chunks"][idx][1] - session["chunks"][idx][0])
+    )
+
+
+def uncovered_chunks(session: Dict) -> List[int]:
+    """Chunks not covered yet and not reserved by a running follow-up."""
+    unavailable = set(session["covered_chunks"]) | _reserved.get(session["document_id"], set())
+    return [idx for idx in range(len(session["chunks"])) if idx not in unavailable]
+
+
+def _ranked(session: Dict, chunk_ids: List[int]) -> List[int]:
+    """Chunk indices ordered by centrality among themselves, best first."""
+    text = session["text"]
+    regions = [text[start:end] for start, end in (session["chunks"][i] for i in chunk_ids)]
+    return [chunk_ids[i] for i in np.argsort(-score_passages(regions), kind="stable")]
+
+
+def _chunk_chars(session: Dict, idx: int) -> int:
+    start, end = session["chunks"][idx]
+    return end - start
+
+
+def select_regions(session: Dict, token_budget: int, min_tokens: int = 0) -> List[int]:
+    """
+    Pick the most central not-yet-covered chunks within a token budget.
+
+    Once every chunk is covered the whole document is eligible again and
+    de-duplication against issued questions does the rest. If the chosen
+    chunks hold fewer than `min_tokens`, more are added (the best uncovered
+    ones first, then covered ones) until they do, so a prompt is never a
+    stray fragment.
+
+    Returns:
+        Chunk indices in document order (at least one)
+    """
+    candidates = uncovered_chunks(session) or list(range(len(session["chunks"])))
+    ranked = _ranked(session, candidates)
+
+    char_budget = token_budget * CHARS_PER_TOKEN
+    chosen = []
+    used = 0
+    for idx in ranked:
+        size = _chunk_chars(session, idx)
+        if chosen and used + size > char_budget:
+            continue
+        chosen.append(idx)
+        used += size
+
+    min_chars = min_tokens * CHARS_PER_TOKEN
+    if used < min_chars:
+        unavailable = set(candidates) | _reserved.get(session["document_id"], set())
+        others = [i for i in range(len(session["chunks"])) if i not in unavailable]
+        for idx in [i for i in ranked if i not in chosen] + (_ranked(session, others) if others else []):
+            if used >= min_chars:
+                break
+            chosen.append(idx)
+            used += _chunk_chars(session, idx)
+    return sorted(chosen)
+
+
+def record_issued(
+    session: Dict,
+    chunk_ids: List[int],
+    english_mcqs: List[Dict],
+    limit: Optional[int] = None
+) -> List[Dict]:
+    """
+    Mark chunks as covered and store newly issued questions.
+
+    Returns:
+        Up to `limit` of english_mcqs that were not issued before
+    """
+    seen = {normalize_question(q["question"]) for q in session["questions"]}
+    fresh = []
+    for mcq in english_mcqs:
+        key = normalize_question(mcq["question"])
+        if key and key not in seen:
+            seen.add(key)
+            fresh.append(mcq)
+        if limit is not None and len(fresh) >= limit:
+            break
+
+    session["questions"].extend(fresh)
+    session["covered_chunks"] = sorted(set(session["covered_chunks"]) | set(chunk_ids))
+    return fresh
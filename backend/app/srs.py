@@ -0,0 +1,175 @@
+import hashlib
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .progress_store import local_connection
+
+# SM-2 parameters
+INITIAL_EASINESS = 2.5
+MIN_EASINESS = 1.3
+PASSING_QUALITY = 3
+
+DAY_SECONDS = 24 * 60 * 60
+
+# SQLite caps bound parameters per statement; state lookups are chunked
+_LOOKUP_CHUNK = 500
+
+# Clustered by (user_id, card_id); the (user_id, due) index turns "next due
+# cards" into a range scan that reads only the rows it returns
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS srs_cards (
+    user_id TEXT NOT NULL,
+    card_id TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    document_id TEXT,
+    easiness REAL NOT NULL,
+    interval_days INTEGER NOT NULL,
+    repetitions INTEGER NOT NULL,
+    due REAL NOT NULL,
+    last_reviewed REAL,
+    PRIMARY KEY (user_id, card_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS srs_cards_due ON srs_cards (user_id, due);
+"""
+
+_schema_ready = False
+
+
+def _connection():
+    global _schema_ready
+    conn = local_connection()
+    if not _schema_ready:
+        conn.executescript(SCHEMA)
+        _schema_ready = True
+    return conn
+
+
+def card_id(question: str, answer: str) -> str:
+    """Stable id of a flashcard, derived from its text."""
+    return hashlib.sha256(f"{question}\n{answer}".encode("utf-8")).hexdigest()[:16]
+
+
+def sm2(easiness: float, interval_days: int, repetitions: int, quality: int) -> Tuple[float, int, int]:
+    """
+    Apply one SM-2 review.
+
+    Args:
+        quality: Recall grade from 0 (blackout) to 5 (perfect)
+
+    Returns:
+        (easiness, interval_days, repetitions) after the review
+    """
+    easiness = max(MIN_EASINESS, easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < PASSING_QUALITY:
+        return easiness, 1, 0
+    repetitions += 1
+    if repetitions == 1:
+        interval_days = 1
+    elif repetitions == 2:
+        interval_days = 6
+    else:
+        interval_days = round(interval_days * easiness)
+    return easiness, interval_days, repetitions
+
+
+def add_cards(user_id: str, flashcards: List[Dict], document_id: Optional[str] = None) -> int:
+    """
+    Add flashcards to a user's deck, due immediately.
+
+    Cards already in the deck keep their review state.
+
+    Returns:
+        Number of cards added
+    """
+    now = time.time()
+    conn = _connection()
+    rows = [
+        (user_id, card.get("id") or card_id(card["question"], card["answer"]),
+         card["question"], card["answer"], document_id, INITIAL_EASINESS, 0, 0, now)
+        for card in flashcards
+    ]
+    with conn:
+        before = conn.total_changes
+        conn.executemany(
+            """
+            INSERT OR IGNORE INTO srs_cards
+                (user_id, card_id, question, answer, document_id, easiness, interval_days, repetitions, due)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+        return conn.total_changes - before
+
+
+def due_cards(user_id: str, limit: int, now: Optional[float] = None) -> Tuple[List[Dict], Optional[float]]:
+    """
+    The next `limit` cards due for review, most overdue first.
+
+    Returns:
+        (cards, next_due_at); next_due_at is when the next card becomes due
+        if none is due yet
+    """
+    now = now or time.time()
+    rows = _connection().execute(
+        "SELECT card_id, question, answer, due FROM srs_cards WHERE user_id = ? ORDER BY due LIMIT ?",
+        (user_id, limit)
+    ).fetchall()
+    cards = [{"id": cid, "question": q, "answer": a} for cid, q, a, due in rows if due <= now]
+    next_due_at = rows[0][3] if rows and not cards else None
+    return cards, next_due_at
+
+
+def record_reviews(user_id: str, reviews: List[Dict]) -> Tuple[int, List[str]]:
+    """
+    Apply a batch of review outcomes in one transaction.
+
+    Args:
+        reviews: Dicts with card_id, quality (0-5) and optional reviewed_at
+
+    Returns:
+        (number recorded, ids of cards not in the user's deck)
+    """
+    now = time.time()
+    conn = _connection()
+    ids = list(dict.fromkeys(r["card_id"] for r in reviews))
+
+    with conn:
+        # Take the write lock before reading so concurrent reviews of the
+        # same card can't overwrite each other's state
+        conn.execute("BEGIN IMMEDIATE")
+        state = {}
+        for i in range(0, len(ids), _LOOKUP_CHUNK):
+            chunk = ids[i:i + _LOOKUP_CHUNK]
+            state.update(
+                (cid, (easiness, interval_days, repetitions))
+                for cid, easiness, interval_days, repetitions in conn.execute(
+                    f"""
+                    SELECT card_id, easiness, interval_days, repetitions FROM srs_cards
+                    WHERE user_id = ? AND card_id IN ({", ".join("?" for _ in chunk)})
+                    """,
+                    (user_id, *chunk)
+                )
+            )
+
+        # Reviews of the same card are applied in the order they happened
+        updates = {}
+        for review in sorted(reviews, key=lambda r: r.get("reviewed_at") or now):
+            cid = review["card_id"]
+            if cid not in state:
+                continue
+            reviewed_at = review.get("reviewed_at") or now
+            state[cid] = sm2(*state[cid], review["quality"])
+            updates[cid] = (*state[cid], reviewed_at + state[cid][1] * DAY_SECONDS, reviewed_at, user_id, cid)
+
+        conn.executemany(
+            """
+            UPDATE srs_cards
+            SET easiness = ?, interval_days = ?, repetitions = ?, due = ?, last_reviewed = ?
+            WHERE user_id = ? AND card_id = ?
+            """,
+            list(updates.values())
+        )
+
+    recorded = sum(1 for r in reviews if r["card_id"] in state)
+    return recorded, [cid for cid in ids if cid not in state]
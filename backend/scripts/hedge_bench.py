@@ -0,0 +1,102 @@
+"""
+Measure tail latency of model calls with and without hedging.
+
+Starts a local fake Gemini server (REST generateContent) whose latency has a
+long tail, points llm_client at it via GEMINI_API_ENDPOINT and issues the
+same calls twice: once with hedging disabled and once enabled.
+
+Usage (from backend/):
+    python -m scripts.hedge_bench [--calls 400] [--concurrency 4] [--tail-rate 0.03]
+
+Hedges share GEMINI_MAX_CONCURRENCY slots with primary calls, so keep
+--concurrency below it or hedges just queue behind the slow calls.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_RESPONSE = json.dumps({
+    "candidates": [{"content": {"parts": [{"text": "[]"}], "role": "model"}, "finishReason": "STOP"}],
+    "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 20, "totalTokenCount": 120},
+}).encode()
+
+
+def make_handler(fast_ms: float, tail_ms: float, tail_rate: float):
+    class FakeModelHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if random.random() < tail_rate:
+                delay = random.uniform(tail_ms / 2, tail_ms)
+            else:
+                delay = random.gauss(fast_ms, fast_ms / 5)
+            time.sleep(max(0.0, delay) / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(FAKE_RESPONSE)))
+            self.end_headers()
+            self.wfile.write(FAKE_RESPONSE)
+
+        def log_message(self, *args):
+            pass
+
+    return FakeModelHandler
+
+
+def run(llm_client, calls: int, concurrency: int):
+    def one_call(_):
+        llm_client.start_request_deadline(30)
+        llm_client.generate("ping", "fake-key", purpose="bench")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_call, range(calls)))
+    return llm_client.call_metrics.summary()["bench"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--fast-ms", type=float, default=40)
+    parser.add_argument("--tail-ms", type=float, default=1500)
+    parser.add_argument("--tail-rate", type=float, default=0.03)
+    args = parser.parse_args()
+
+    random.seed(7)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.fast_ms, args.tail_ms, args.tail_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["GEMINI_API_ENDPOINT"] = f"http://127.0.0.1:{server.server_port}"
+
+    # Imported after the endpoint is set; llm_client reads it at import time
+    from app import llm_client
+
+    # Warm up the attempt latency window so the hedge delay (p95) is known
+    # from the first measured call; only call counters are reset per mode
+    llm_client.HEDGE_ENABLED = False
+    run(llm_client, llm_client.HEDGE_MIN_SAMPLES * 2, args.concurrency)
+
+    results = {}
+    for label, enabled in (("no hedging", False), ("hedging", True)):
+        llm_client.call_metrics.reset_calls()
+        llm_client.HEDGE_ENABLED = enabled
+        results[label] = run(llm_client, args.calls, args.concurrency)
+
+    server.shutdown()
+
+    print(f"\n{args.calls} calls, concurrency {args.concurrency}, "
+          f"{args.tail_rate:.0%} of responses take {args.tail_ms / 2:.0f}-{args.tail_ms:.0f} ms\n")
+    print(f"{'mode':<12}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'hedge rate':>12}{'hedge wins':>12}")
+    for label, m in results.items():
+        print(f"{label:<12}{m['p50_ms']:>9}{m['p95_ms']:>9}{m['p99_ms']:>9}"
+              f"{m['hedge_rate']:>12.1%}{m['hedge_wins']:>12}")
+
+    before, after = results["no hedging"]["p99_ms"], results["hedging"]["p99_ms"]
+    print(f"\np99 improvement: {before:.0f} ms -> {after:.0f} ms ({1 - after / before:.0%} lower)")
+
+
+if __name__ == "__main__":
+    main()
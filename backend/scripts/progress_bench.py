@@ -0,0 +1,110 @@
+"""
+Measure progress-event ingestion throughput with and without group commit.
+
+"per-request commit" has every client thread open its own connection and
+commit its batch in its own transaction. "group commit" submits the same
+batches to the ProgressWriter, which folds everything queued into one
+transaction. Both write to a fresh SQLite database in WAL mode.
+
+Usage (from backend/):
+    python -m scripts.progress_bench [--clients 64] [--batches 2000] [--batch-size 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import progress_store
+
+
+def make_batches(batches: int, batch_size: int, users: int):
+    rng = random.Random(11)
+    return [
+        [
+            {"user_id": f"user-{rng.randrange(users)}", "kind": progress_store.ANSWER,
+             "correct": rng.random() < 0.7, "question": "Which algorithm minimizes the loss?"}
+            for _ in range(batch_size)
+        ]
+        for _ in range(batches)
+    ]
+
+
+def per_request_commit(path: str, batches, clients: int):
+    local = threading.local()
+
+    def send(batch):
+        if not hasattr(local, "conn"):
+            local.conn = progress_store.connect(path)
+        start = time.perf_counter()
+        progress_store.write_events(local.conn, [batch])
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return list(pool.map(send, batches)), None
+
+
+def group_commit(path: str, batches, clients: int):
+    writer = progress_store.ProgressWriter(path)
+    writer.start()
+
+    def send(batch):
+        start = time.perf_counter()
+        writer.submit(batch).result()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = list(pool.map(send, batches))
+    writer.stop()
+    return latencies, writer.commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--batches", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--users", type=int, default=5000)
+    args = parser.parse_args()
+
+    batches = make_batches(args.batches, args.batch_size, args.users)
+    total_events = args.batches * args.batch_size
+
+    print(f"\n{args.batches} batches x {args.batch_size} events from {args.clients} concurrent clients\n")
+    print(f"{'mode':<20}{'events/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'commits':>9}")
+    for label, run in (("per-request commit", per_request_commit), ("group commit", group_commit)):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "progress.db")
+            progress_store.connect(path).close()
+            start = time.perf_counter()
+            latencies, commits = run(path, batches, args.clients)
+            elapsed = time.perf_counter() - start
+
+            conn = progress_store.connect(path)
+            stored = conn.execute("SELECT SUM(total_questions) FROM user_progress").fetchone()[0]
+            conn.close()
+            assert stored == total_events, f"{label}: aggregates count {stored} of {total_events} events"
+
+        cuts = statistics.quantiles(latencies, n=100)
+        print(f"{label:<20}{total_events / elapsed:>10.0f}{cuts[49] * 1000:>9.1f}{cuts[98] * 1000:>9.1f}"
+              f"{commits if commits is not None else args.batches:>9}")
+
+    # Reading progress is one primary-key lookup regardless of event count
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "progress.db")
+        conn = progress_store.connect(path)
+        progress_store.write_events(conn, batches)
+        progress_store.PROGRESS_DB_PATH = path
+        start = time.perf_counter()
+        for i in range(1000):
+            progress_store.get_progress(f"user-{i % args.users}")
+        read_us = (time.perf_counter() - start) * 1000
+        conn.close()
+    print(f"\nget_progress over {total_events} stored events: {read_us:.1f} µs per read")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compare serialization CPU time and payload size of /process-pdf responses.
+
+"before" reproduces FastAPI's default path for a response_model endpoint:
+pydantic validation of the returned dicts, jsonable_encoder and json.dumps.
+"after" is the current path: orjson on the plain payload, then brotli/gzip.
+
+Usage (from backend/):
+    python -m scripts.serialization_bench [--languages 10] [--questions 20]
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models import MultiLanguageProcessResponse
+from app.responses import brotli, compress, dumps, orjson
+
+SAMPLE_TEXT = {
+    "English": "Which algorithm updates the weights of a neural network using the gradient of the loss?",
+    "Hindi": "कौन सा एल्गोरिदम हानि के ग्रेडिएंट का उपयोग करके तंत्रिका नेटवर्क के भार को अद्यतन करता है?",
+    "Japanese": "損失の勾配を使ってニューラルネットワークの重みを更新するアルゴリズムはどれですか？",
+    "Russian": "Какой алгоритм обновляет веса нейронной сети, используя градиент функции потерь?",
+    "Arabic": "ما الخوارزمية التي تحدّث أوزان الشبكة العصبية باستخدام تدرج دالة الخسارة؟",
+}
+
+
+def shuffled(text: str, rng: random.Random) -> str:
+    # Japanese has no spaces; shuffle characters there so the sample isn't
+    # trivially compressible
+    parts = text.split() if " " in text else list(text)
+    rng.shuffle(parts)
+    return (" " if " " in text else "").join(parts)
+
+
+def build_payload(languages: int, questions: int) -> dict:
+    rng = random.Random(42)
+    names = list(SAMPLE_TEXT)
+    results = {}
+    for i in range(languages):
+        base = SAMPLE_TEXT[names[i % len(names)]]
+        lang = f"{names[i % len(names)]}-{i}"
+        mcqs = []
+        for _ in range(questions):
+            options = [shuffled(base, rng)[:40] for _ in range(4)]
+            mcqs.append({
+                "question": shuffled(base, rng),
+                "answer": options[0],
+                "options": options,
+                "difficulty": "medium",
+            })
+        results[lang] = {
+            "mcqs": mcqs,
+            "flashcards": [{"question": m["question"], "answer": m["answer"]} for m in mcqs],
+        }
+    return {
+        "text": SAMPLE_TEXT["English"] * 5,
+        "page_count": 120,
+        "results": results,
+        "usage": {"total": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2, "calls": 1},
+                  "by_language": {}},
+    }
+
+
+def serialize_before(payload: dict) -> bytes:
+    model = MultiLanguageProcessResponse.model_validate(payload)
+    encoded = jsonable_encoder(model)
+    return json.dumps(encoded, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def timed(func, *args, repeat: int = 50):
+    start = time.process_time()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.process_time() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--languages", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = build_payload(args.languages, args.questions)
+
+    before_ms, before_body = timed(serialize_before, payload)
+    after_ms, after_body = timed(dumps, payload)
+    br_ms, (br_body, br_encoding) = timed(compress, after_body, "br, gzip")
+    gz_ms, gz_body = timed(gzip.compress, after_body, 6)
+
+    print(f"\n{args.languages} languages x {args.questions} MCQs "
+          f"(orjson={'yes' if orjson else 'no'}, brotli={'yes' if brotli else 'no'})\n")
+    print(f"{'path':<34}{'CPU ms':>9}{'bytes':>10}")
+    print(f"{'before: validate + json.dumps':<34}{before_ms:>9.2f}{len(before_body):>10}")
+    print(f"{'after: orjson':<34}{after_ms:>9.2f}{len(after_body):>10}")
+    print(f"{'after: orjson + gzip':<34}{after_ms + gz_ms:>9.2f}{len(gz_body):>10}")
+    if br_encoding == "br":
+        print(f"{'after: orjson + brotli':<34}{after_ms + br_ms:>9.2f}{len(br_body):>10}")
+
+
+if __name__ == "__main__":
+    main()
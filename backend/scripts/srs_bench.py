@@ -0,0 +1,85 @@
+"""
+Measure the spaced-repetition "next due cards" query at deployment scale.
+
+Fills a fresh database with --users x --cards-per-user cards with random due
+times, then times due_cards() for random users with the (user_id, due)
+index and again after dropping it. Without the index SQLite sorts the
+user's whole deck, so the gap grows with cards per user.
+
+Usage (from backend/):
+    python -m scripts.srs_bench [--users 400] [--cards-per-user 5000] [--limit 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app import progress_store, srs
+
+
+def fill(conn, users: int, cards_per_user: int):
+    rng = random.Random(5)
+    now = time.time()
+    conn.executescript(srs.SCHEMA)
+    with conn:
+        for u in range(users):
+            conn.executemany(
+                "INSERT INTO srs_cards (user_id, card_id, question, answer, easiness, interval_days, repetitions, due) "
+                "VALUES (?, ?, ?, ?, 2.5, 0, 0, ?)",
+                [
+                    (f"user-{u}", f"{u}-{c}", f"Question {c}?", f"Answer {c}",
+                     now + rng.uniform(-30, 30) * srs.DAY_SECONDS)
+                    for c in range(cards_per_user)
+                ]
+            )
+
+
+def time_queries(users: int, limit: int, queries: int):
+    rng = random.Random(9)
+    latencies = []
+    for _ in range(queries):
+        user = f"user-{rng.randrange(users)}"
+        start = time.perf_counter()
+        srs.due_cards(user, limit)
+        latencies.append((time.perf_counter() - start) * 1000)
+    cuts = statistics.quantiles(latencies, n=100)
+    return cuts[49], cuts[98]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--cards-per-user", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        progress_store.PROGRESS_DB_PATH = os.path.join(tmp, "progress.db")
+        conn = progress_store.local_connection()
+
+        start = time.perf_counter()
+        fill(conn, args.users, args.cards_per_user)
+        total = args.users * args.cards_per_user
+        print(f"\nLoaded {total:,} cards for {args.users:,} users in {time.perf_counter() - start:.1f} s\n")
+
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT card_id, question, answer, due FROM srs_cards "
+            "WHERE user_id = ? ORDER BY due LIMIT ?", ("user-0", args.limit)
+        ).fetchall()
+        print("query plan:", "; ".join(row[-1] for row in plan))
+
+        print(f"\n{'mode':<22}{'p50 ms':>9}{'p99 ms':>9}")
+        p50, p99 = time_queries(args.users, args.limit, args.queries)
+        print(f"{'(user_id, due) index':<22}{p50:>9.3f}{p99:>9.3f}")
+
+        conn.execute("DROP INDEX srs_cards_due")
+        p50, p99 = time_queries(args.users, args.limit, args.queries)
+        print(f"{'primary key only':<22}{p50:>9.3f}{p99:>9.3f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
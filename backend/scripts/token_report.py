@@ -0,0 +1,153 @@
+"""
+Compare prompt tokens per generated question for the legacy and compact prompts.
+
+Usage (from backend/):
+    python -m scripts.token_report [path/to/file.pdf] [--questions 20] [--language Spanish]
+
+Counts tokens with the Gemini count_tokens API when GEMINI_API_KEY is set,
+otherwise falls back to the ~4 chars/token estimate.
+"""
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+
+from app import llm_client
+from app.mcq_generator import MCQ_SYSTEM_INSTRUCTION, TRANSLATE_SYSTEM_INSTRUCTION, PROMPT_TOKEN_BUDGET
+from app.passage_selector import estimate_tokens, select_salient_passages
+from app.pdf_processor import extract_text_from_pdf
+
+SAMPLE_TEXT = """
+Artificial Intelligence (AI) was coined by John McCarthy in 1956.
+McCarthy defined AI as "the science of making intelligent machines."
+Machine learning is a subset of AI that focuses on algorithms that learn from data.
+"""
+
+SAMPLE_MCQ = {
+    "question": "Who coined the term 'Artificial Intelligence'?",
+    "answer": "John McCarthy",
+    "options": ["John McCarthy", "Alan Turing", "Marvin Minsky", "Herbert Simon"],
+    "difficulty": "easy",
+}
+
+# Prompt templates as they were before static instructions were factored out
+LEGACY_GENERATE_PROMPT = """
+Generate exactly {max_questions} multiple choice questions (MCQs) from the following text.
+Each question MUST have exactly 4 options, with ONE correct answer.
+
+IMPORTANT RULES:
+1. Make questions MEANINGFUL - test real understanding
+2. Make ALL options PLAUSIBLE and SPECIFIC
+3. NEVER use vague options like: "wrong answer", "incorrect concept", "different perspective"
+4. For "Who" questions: Use SPECIFIC PERSON NAMES as distractors
+5. For other questions: Use SPECIFIC facts/terms/concepts as distractors
+
+FORMAT STRICTLY AS JSON:
+[
+  {{
+    "question": "Question here?",
+    "answer": "Correct answer",
+    "options": ["Correct", "Distractor 1", "Distractor 2", "Distractor 3"],
+    "difficulty": "easy|medium|hard"
+  }}
+]
+
+EXAMPLES OF GOOD DISTRACTORS:
+Question: "Who coined the term 'Artificial Intelligence'?"
+Good distractors: ["Alan Turing", "Marvin Minsky", "Herbert Simon"]
+BAD distractors: ["A different scientist", "Not John McCarthy", "Someone else"]
+
+TEXT:
+{text}
+
+Return ONLY the JSON array. No explanations.
+"""
+
+LEGACY_TRANSLATE_PROMPT = """You MUST translate this MCQ to {target_lang}. Output ONLY JSON.
+
+English question: {question}
+
+STRICT INSTRUCTIONS:
+- Translate the ENTIRE question to {target_lang}
+- Translate the ENTIRE answer to {target_lang}
+- Translate EVERY option to {target_lang}
+- Make sure the translated answer matches one of the translated options
+- Keep "difficulty" as-is
+- ONLY return valid JSON, no explanations
+
+Here is the English MCQ to translate:
+{mcq_json}
+
+Return ONLY this JSON format with translations in {target_lang}:
+{{
+  "question": "[TRANSLATE TO {target_lang}]",
+  "answer": "[TRANSLATE TO {target_lang}]",
+  "options": ["[TRANSLATE]", "[TRANSLATE]", "[TRANSLATE]", "[TRANSLATE]"],
+  "difficulty": "[KEEP SAME]"
+}}"""
+
+
+def make_counter(api_key):
+    if not api_key:
+        return lambda prompt, system_instruction=None: estimate_tokens((system_instruction or "") + prompt)
+    return lambda prompt, system_instruction=None: llm_client.count_tokens(prompt, api_key, system_instruction)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", help="PDF to build prompts from (defaults to a sample text)")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--language", default="Spanish")
+    args = parser.parse_args()
+
+    load_dotenv()
+    api_key = os.environ.get("GEMINI_API_KEY")
+    count = make_counter(api_key)
+
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            text, _ = extract_text_from_pdf(f.read())
+    else:
+        text = SAMPLE_TEXT.strip()
+
+    n = args.questions
+    lang = args.language
+
+    legacy_text = text[:6000] + "... [text truncated]" if len(text) > 6000 else text
+    legacy_generate = count(LEGACY_GENERATE_PROMPT.format(max_questions=n, text=legacy_text))
+    legacy_translate = count(LEGACY_TRANSLATE_PROMPT.format(
+        target_lang=lang,
+        question=SAMPLE_MCQ["question"],
+        mcq_json=json.dumps(SAMPLE_MCQ, ensure_ascii=False),
+    ))
+
+    compact_text = select_salient_passages(text, token_budget=PROMPT_TOKEN_BUDGET)
+    compact_generate = count(
+        f"Generate exactly {n} MCQs from this text.\n\nTEXT:\n{compact_text}",
+        MCQ_SYSTEM_INSTRUCTION,
+    )
+    compact_translate = count(
+        f"Language: {lang}\n{json.dumps(SAMPLE_MCQ, ensure_ascii=False, separators=(',', ':'))}",
+        TRANSLATE_SYSTEM_INSTRUCTION,
+    )
+
+    rows = [
+        ("legacy", legacy_generate, legacy_translate),
+        ("compact", compact_generate, compact_translate),
+    ]
+
+    print(f"\nPrompt tokens ({'count_tokens API' if api_key else 'estimated'}), "
+          f"{n} questions, translation to {lang}\n")
+    print(f"{'prompts':<10}{'generate':>10}{'per-item tr':>13}{'EN / q':>9}{f'{lang} / q':>14}")
+    for name, generate_tokens, translate_tokens in rows:
+        per_question = generate_tokens / n
+        print(f"{name:<10}{generate_tokens:>10}{translate_tokens:>13}"
+              f"{per_question:>9.1f}{per_question + translate_tokens:>14.1f}")
+
+    saved = 1 - (compact_generate / n + compact_translate) / (legacy_generate / n + legacy_translate)
+    print(f"\nPrompt tokens per translated question reduced by {saved:.0%}")
+
+
+if __name__ == "__main__":
+    main()